@@ -9,21 +9,48 @@ campus showing access point distribution (hotspots).
 Input:  data/building_locations_processed.csv (cleaned building data)
         new-dartmouth-campus-map.png (campus map background)
 Output: interactive_campus_heatmap.html (interactive visualization)
+        assets/campus-map.<hash>.<ext> (map image, referenced by URL)
+        tiles/ (with --tiles: XYZ tile pyramid of the map + heat glow)
 
 Features:
 - Interactive tooltips showing building details on hover
 - Color-coded by activity (red-yellow spectrum)
 - Bubble size represents number of access points
-- Zoom controls for detailed exploration
+- Zoom controls and drag-to-pan for detailed exploration
 - Toggle heatmap mode for glow effect visualization
+- Map, glow and markers are cached offscreen layers, so panning and toggling
+  only composite them (re-rasterized when the zoom changes)
+- Map image as a separate content-hashed asset (cacheable across pages),
+  optionally downscaled / WebP; --inline embeds it as base64 instead
+- Optional tile pyramid: the page then fetches only the tiles in view
 """
 
 import pandas as pd
+import numpy as np
+import io
 import json
+import math
+import hashlib
+import argparse
 from pathlib import Path
 import base64
 
 
+# Map asset: <asset dir>/campus-map.<first 12 hex of sha256>.<ext>
+ASSET_NAME = 'campus-map'
+ASSET_FORMATS = {'webp': ('WEBP', '.webp'), 'jpeg': ('JPEG', '.jpg'), 'png': ('PNG', '.png')}
+ASSET_QUALITY = 85
+
+
+# Tile pyramid layout: <tiles>/<layer>/<z>/<x>/<y>.<ext>, level 0 fits in one tile
+TILE_SIZE = 256
+TILE_LAYERS = {'base': 'jpg', 'glow': 'png'}
+JPEG_QUALITY = 85
+
+# Heatmap-mode glow, as drawn by the page: radial gradient stops (offset, alpha)
+GLOW_STOPS = ((0.0, 0.8), (0.4, 0.4), (0.7, 0.15), (1.0, 0.0))
+
+
 def load_processed_data(csv_file):
     """Load the processed building location data."""
     print(f"📂 Loading processed data from {csv_file}...")
@@ -42,13 +69,151 @@ def encode_campus_map_image(image_path):
     return f"data:image/png;base64,{encoded}"
 
 
-def generate_html(df, map_image_base64, output_file):
-    """Generate the interactive HTML heatmap."""
+def write_map_asset(image_path, asset_dir, max_width=None, fmt=None):
+    """
+    Write the campus map to asset_dir under a content-hashed name, so it can be
+    served with a far-future cache lifetime and shared by every page using it.
+    max_width downscales and fmt ('webp', 'jpeg', 'png') re-encodes; with
+    neither, the original bytes are copied and Pillow is not needed.
+    Returns (asset path, map size): the map size is the original image's
+    (width, height), which the building pixel coordinates refer to, or None
+    when the image was copied as is (the page then uses the image's own size).
+    """
+    print(f"🖼️  Writing campus map asset...")
+    image_path = Path(image_path)
+    map_size = None
+    if max_width is None and fmt is None:
+        data = image_path.read_bytes()
+        suffix = image_path.suffix.lower()
+    else:
+        from PIL import Image   # only re-encoding needs Pillow
+
+        im = Image.open(image_path)
+        map_size = im.size
+        pil_format, suffix = ASSET_FORMATS[fmt] if fmt else (im.format, image_path.suffix.lower())
+        if max_width is not None and im.width > max_width:
+            im = im.resize((max_width, round(im.height * max_width / im.width)), Image.LANCZOS)
+        if pil_format == 'JPEG' and im.mode != 'RGB':
+            im = im.convert('RGB')
+        buf = io.BytesIO()
+        im.save(buf, format=pil_format, quality=ASSET_QUALITY)
+        data = buf.getvalue()
+        print(f"   {map_size[0]}x{map_size[1]} -> {im.width}x{im.height} {pil_format}")
+
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    path = Path(asset_dir) / f"{ASSET_NAME}.{digest}{suffix}"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_bytes(data)
+        tmp.replace(path)
+    print(f"   {path} ({len(data)} bytes, {image_path.stat().st_size} original)")
+    return path, map_size
+
+
+def marker_radius(activity):
+    """Marker radius in map pixels (same formula as the page's JavaScript)."""
+    return np.clip(5 + np.asarray(activity, dtype=float) * 1.5, 8, 30)
+
+
+def pyramid_max_zoom(width, height, tile_size=TILE_SIZE):
+    """Top zoom level (full resolution) of a pyramid whose level 0 fits in one tile."""
+    return max(0, math.ceil(math.log2(max(width, height) / tile_size)))
+
+
+def render_glow_tile(df, k, x0, y0, w, h):
+    """
+    Premultiplied RGBA float tile of the heatmap-mode glow at level scale k
+    (level pixels per map pixel), covering level pixels [x0, x0+w) x [y0, y0+h).
+    Buildings are composited source-over in data order, like the page's canvas.
+    """
+    out = np.zeros((h, w, 4), dtype=np.float32)
+    activity = df['num_access_points'].to_numpy(dtype=float)
+    lo, hi = activity.min(), activity.max()
+    norm = (activity - lo) / (hi - lo) if hi > lo else np.zeros_like(activity)
+    glow = marker_radius(activity) * 4 * k
+    cx = df['map_pixel_x'].to_numpy(dtype=float) * k
+    cy = df['map_pixel_y'].to_numpy(dtype=float) * k
+    offsets, alphas = zip(*GLOW_STOPS)
+    for x, y, r, n in zip(cx, cy, glow, norm):
+        ax0, ax1 = max(int(x - r) - x0, 0), min(int(math.ceil(x + r)) - x0, w)
+        ay0, ay1 = max(int(y - r) - y0, 0), min(int(math.ceil(y + r)) - y0, h)
+        if ax0 >= ax1 or ay0 >= ay1:
+            continue
+        px = np.arange(ax0, ax1) + x0 + 0.5 - x
+        py = np.arange(ay0, ay1) + y0 + 0.5 - y
+        d = np.sqrt(px[None, :] ** 2 + py[:, None] ** 2) / r
+        a = np.interp(d, offsets, alphas).astype(np.float32)
+        src = np.stack([a, a * (1 - n), np.zeros_like(a), a], axis=-1)   # rgb(255, 255*(1-n), 0)
+        win = out[ay0:ay1, ax0:ax1]
+        win *= (1 - a)[..., None]
+        win += src
+    return out
+
+
+def write_tile_pyramid(map_image_path, df, tiles_dir, tile_size=TILE_SIZE):
+    """
+    Cut the campus map and the heat glow overlay into an XYZ tile pyramid:
+    level max_zoom is the map at full resolution, each lower level halves it.
+    Background tiles are JPEG; glow tiles are RGBA PNG, and fully transparent
+    ones are not written. Returns the manifest the page needs.
+    """
+    from PIL import Image   # only the tiled output needs Pillow
+
+    print(f"🧩 Writing tile pyramid to {tiles_dir}...")
+    tiles_dir = Path(tiles_dir)
+    full = Image.open(map_image_path).convert('RGB')
+    width, height = full.size
+    max_zoom = pyramid_max_zoom(width, height, tile_size)
+    glow_tiles = []
+    count = 0
+    for z in range(max_zoom, -1, -1):
+        k = 2.0 ** (z - max_zoom)
+        level = full if z == max_zoom else full.resize(
+            (max(1, math.ceil(width * k)), max(1, math.ceil(height * k))), Image.LANCZOS)
+        for tx in range(math.ceil(level.width / tile_size)):
+            for ty in range(math.ceil(level.height / tile_size)):
+                x0, y0 = tx * tile_size, ty * tile_size
+                box = (x0, y0, min(x0 + tile_size, level.width), min(y0 + tile_size, level.height))
+                for layer in TILE_LAYERS:
+                    (tiles_dir / layer / str(z) / str(tx)).mkdir(parents=True, exist_ok=True)
+                path = f"{z}/{tx}/{ty}"
+                level.crop(box).save(tiles_dir / 'base' / f"{path}.{TILE_LAYERS['base']}",
+                                     quality=JPEG_QUALITY)
+                glow = render_glow_tile(df, k, x0, y0, box[2] - x0, box[3] - y0)
+                count += 1
+                if glow[..., 3].max() * 255 < 0.5:
+                    continue
+                # Un-premultiply for PNG's straight alpha
+                a = glow[..., 3:4]
+                rgb = np.divide(glow[..., :3], a, out=np.zeros_like(glow[..., :3]), where=a > 0)
+                rgba = np.concatenate([rgb, a], axis=-1)
+                Image.fromarray(np.rint(rgba * 255).astype(np.uint8), 'RGBA').save(
+                    tiles_dir / 'glow' / f"{path}.{TILE_LAYERS['glow']}")
+                glow_tiles.append(path)
+    print(f"   {count} map tiles, {len(glow_tiles)} glow tiles, zoom 0-{max_zoom}")
+    return {'tileSize': tile_size, 'maxZoom': max_zoom, 'width': width, 'height': height,
+            'ext': TILE_LAYERS, 'glow': glow_tiles}
+
+
+def generate_html(df, map_image_src, output_file, tiles=None, tiles_url='tiles', map_size=None):
+    """
+    Generate the interactive HTML heatmap. map_image_src is the map's URL (or
+    a data: URI from encode_campus_map_image); map_size is the (width, height)
+    the building coordinates refer to when the image itself was downscaled.
+    With `tiles` (the manifest from write_tile_pyramid, served at `tiles_url`
+    relative to the page) the map and glow are drawn from the pyramid instead.
+    """
     
     print(f"🎨 Generating interactive HTML...")
     
     # Convert dataframe to JSON for JavaScript
     buildings_json = df.to_json(orient='records')
+    tiles_json = json.dumps(None if tiles is None else {**tiles, 'url': tiles_url})
+    map_size_json = json.dumps(None if map_size is None else list(map_size))
+    # Start fetching an external map before the script at the end of the body runs
+    preload = (f'<link rel="preload" as="image" href="{map_image_src}">'
+               if map_image_src and not map_image_src.startswith('data:') else '')
     
     # Get statistics for color scaling
     min_activity = int(df['num_access_points'].min())
@@ -61,6 +226,7 @@ def generate_html(df, map_image_base64, output_file):
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Dartmouth Campus Interactive Heatmap</title>
+    {preload}
     <style>
         * {{
             margin: 0;
@@ -338,6 +504,8 @@ def generate_html(df, map_image_base64, output_file):
         const buildings = {buildings_json};
         const minActivity = {min_activity};
         const maxActivity = {max_activity};
+        const tiles = {tiles_json};  // tile pyramid manifest, or null for a single image
+        const mapSize = {map_size_json};  // [w, h] the building coordinates use, or null = the image's own
         
         // Canvas setup
         const canvas = document.getElementById('campusMap');
@@ -352,15 +520,72 @@ def generate_html(df, map_image_base64, output_file):
         let dragStartX = 0;
         let dragStartY = 0;
         let heatmapMode = false;
+        let baseScale = 1;  // canvas pixels per map pixel at zoom 1
+        let mapWidth = 0;
+        let mapHeight = 0;
+        
+        // Backing store at display resolution, not map resolution: the map is
+        // scaled into it and the cached layers are sized from it
+        function sizeCanvas() {{
+            canvas.width = Math.round((canvas.clientWidth || mapWidth) * (window.devicePixelRatio || 1));
+            canvas.height = Math.round(canvas.width * mapHeight / mapWidth);
+            baseScale = canvas.width / mapWidth;
+        }}
+        
+        // Tiles: loaded once, redrawn (one frame per batch) as they arrive
+        const tileCache = new Map();
+        const glowTiles = new Set(tiles ? tiles.glow : []);
+        const maxCachedTiles = 512;
+        let drawPending = false;
+        
+        function requestDraw() {{
+            if (drawPending) return;
+            drawPending = true;
+            requestAnimationFrame(() => {{
+                drawPending = false;
+                draw();
+            }});
+        }}
         
-        // Load campus map image
-        const img = new Image();
-        img.src = '{map_image_base64}';
-        img.onload = () => {{
-            canvas.width = img.width;
-            canvas.height = img.height;
-            draw();
-        }};
+        function getTile(layer, z, x, y) {{
+            const path = `${{z}}/${{x}}/${{y}}`;
+            if (layer === 'glow' && !glowTiles.has(path)) return null;  // fully transparent
+            const key = `${{layer}}/${{path}}`;
+            let tile = tileCache.get(key);
+            if (tile) {{
+                tileCache.delete(key);  // re-inserted below as most recently used
+            }} else {{
+                if (tileCache.size >= maxCachedTiles) {{
+                    tileCache.delete(tileCache.keys().next().value);  // least recently used
+                }}
+                tile = new Image();
+                tile.onload = requestDraw;
+                tile.src = `${{tiles.url}}/${{key}}.${{tiles.ext[layer]}}`;
+            }}
+            tileCache.set(key, tile);
+            return tile.complete && tile.naturalWidth > 0 ? tile : null;
+        }}
+        
+        // Draw the tiles of one layer that intersect the view, from the level
+        // whose resolution just covers the current zoom
+        function drawTiles(layer) {{
+            const s = baseScale * scale;
+            const z = Math.max(0, Math.min(tiles.maxZoom, tiles.maxZoom + Math.ceil(Math.log2(s))));
+            const span = tiles.tileSize * 2 ** (tiles.maxZoom - z);  // map pixels per tile
+            const x0 = Math.max(0, Math.floor(-offsetX / s / span));
+            const y0 = Math.max(0, Math.floor(-offsetY / s / span));
+            const x1 = Math.min(Math.ceil(tiles.width / span), Math.ceil((canvas.width - offsetX) / s / span));
+            const y1 = Math.min(Math.ceil(tiles.height / span), Math.ceil((canvas.height - offsetY) / s / span));
+            for (let x = x0; x < x1; x++) {{
+                for (let y = y0; y < y1; y++) {{
+                    const tile = getTile(layer, z, x, y);
+                    if (tile) {{
+                        const f = span / tiles.tileSize;
+                        ctx.drawImage(tile, x * span, y * span, tile.naturalWidth * f, tile.naturalHeight * f);
+                    }}
+                }}
+            }}
+        }}
         
         // Color function (red-yellow spectrum)
         function getColor(activity) {{
@@ -371,56 +596,126 @@ def generate_html(df, map_image_base64, output_file):
             return `rgb(${{red}}, ${{green}}, ${{blue}})`;
         }}
         
-        // Drawing function
+        // Offscreen layers: the heat glow and the markers, rasterized at the
+        // current zoom for the visible viewport plus a margin, then composited
+        // with one pixel-aligned drawImage per layer per frame, so they stay
+        // sharp at every zoom. Panning within the margin and toggling reuse
+        // them; a zoom change, a pan past the margin or a resize (or new data:
+        // invalidateLayers) re-rasterizes them on the next draw. The map itself
+        // is drawn straight from the decoded image (or from tiles).
+        const maxLayerSize = 4096;  // px per side, viewport plus margins
+        const layers = {{ glow: null, markers: null }};
+        
+        function makeCanvas(width, height) {{
+            if (typeof OffscreenCanvas !== 'undefined') return new OffscreenCanvas(width, height);
+            const c = document.createElement('canvas');
+            c.width = width;
+            c.height = height;
+            return c;
+        }}
+        
+        function invalidateLayers() {{
+            layers.glow = layers.markers = null;
+        }}
+        
+        // Still usable if painted at this zoom and canvas size, and the pan
+        // since then has not moved the view past the layer's margin
+        function layerValid(layer, s) {{
+            return layer && layer.s === s && layer.cw === canvas.width && layer.ch === canvas.height
+                && Math.abs(offsetX - layer.ox) <= layer.mx && Math.abs(offsetY - layer.oy) <= layer.my;
+        }}
+        
+        function getLayer(name, paint) {{
+            const s = baseScale * scale;
+            if (!layerValid(layers[name], s)) {{
+                const mx = Math.max(0, Math.floor(Math.min(canvas.width, maxLayerSize - canvas.width) / 2));
+                const my = Math.max(0, Math.floor(Math.min(canvas.height, maxLayerSize - canvas.height) / 2));
+                const c = makeCanvas(canvas.width + 2 * mx, canvas.height + 2 * my);
+                const lctx = c.getContext('2d');
+                // Layer pixel (0, 0) is canvas pixel (-mx, -my) at the current pan
+                lctx.setTransform(s, 0, 0, s, offsetX + mx, offsetY + my);
+                paint(lctx);
+                layers[name] = {{ canvas: c, s, cw: canvas.width, ch: canvas.height,
+                                  ox: offsetX, oy: offsetY, mx, my }};
+            }}
+            return layers[name];
+        }}
+        
+        function drawLayer(layer) {{
+            // Already at screen resolution: place it on whole pixels, no resampling
+            ctx.drawImage(layer.canvas, Math.round(offsetX - layer.ox - layer.mx),
+                          Math.round(offsetY - layer.oy - layer.my));
+        }}
+        
+        function paintGlow(lctx) {{
+            buildings.forEach(building => {{
+                const x = building.map_pixel_x;
+                const y = building.map_pixel_y;
+                const activity = building.num_access_points;
+                const glowRadius = markerRadius(activity) * 4;
+                const gradient = lctx.createRadialGradient(x, y, 0, x, y, glowRadius);
+                const normalized = (activity - minActivity) / (maxActivity - minActivity);
+                const red = 255;
+                const green = Math.round(255 * (1 - normalized));
+                
+                gradient.addColorStop(0, `rgba(${{red}}, ${{green}}, 0, 0.8)`);
+                gradient.addColorStop(0.4, `rgba(${{red}}, ${{green}}, 0, 0.4)`);
+                gradient.addColorStop(0.7, `rgba(${{red}}, ${{green}}, 0, 0.15)`);
+                gradient.addColorStop(1, `rgba(${{red}}, ${{green}}, 0, 0)`);
+                
+                lctx.fillStyle = gradient;
+                lctx.fillRect(x - glowRadius, y - glowRadius, glowRadius * 2, glowRadius * 2);
+            }});
+        }}
+        
+        function paintMarkers(lctx) {{
+            lctx.strokeStyle = 'rgba(0, 0, 0, 0.5)';
+            lctx.lineWidth = 2;
+            buildings.forEach(building => {{
+                lctx.beginPath();
+                lctx.arc(building.map_pixel_x, building.map_pixel_y, markerRadius(building.num_access_points), 0, Math.PI * 2);
+                lctx.fillStyle = getColor(building.num_access_points);
+                lctx.fill();
+                lctx.stroke();
+            }});
+        }}
+        
+        function markerRadius(activity) {{
+            return Math.max(8, Math.min(30, 5 + activity * 1.5));
+        }}
+        
+        // Drawing function: the map under the current pan/zoom, then the cached layers
         function draw() {{
+            if (!mapWidth) return;  // map not loaded yet
+            const s = baseScale * scale;
+            
             ctx.clearRect(0, 0, canvas.width, canvas.height);
             ctx.save();
             
             // Apply transformations
             ctx.translate(offsetX, offsetY);
-            ctx.scale(scale, scale);
+            ctx.scale(s, s);
             
-            // Draw campus map
+            // Draw campus map (a downscaled asset is stretched back to mapSize)
             ctx.globalAlpha = heatmapMode ? 0.4 : 0.9;
-            ctx.drawImage(img, 0, 0);
+            if (tiles) {{
+                drawTiles('base');
+            }} else {{
+                ctx.drawImage(img, 0, 0, mapWidth, mapHeight);
+            }}
             ctx.globalAlpha = 1.0;
             
-            // Draw buildings
-            buildings.forEach(building => {{
-                const x = building.map_pixel_x;
-                const y = building.map_pixel_y;
-                const activity = building.num_access_points;
-                const color = getColor(activity);
-                const radius = Math.max(8, Math.min(30, 5 + activity * 1.5));
-                
-                // Heatmap glow effect
-                if (heatmapMode) {{
-                    const glowRadius = radius * 4;
-                    const gradient = ctx.createRadialGradient(x, y, 0, x, y, glowRadius);
-                    const normalized = (activity - minActivity) / (maxActivity - minActivity);
-                    const red = 255;
-                    const green = Math.round(255 * (1 - normalized));
-                    
-                    gradient.addColorStop(0, `rgba(${{red}}, ${{green}}, 0, 0.8)`);
-                    gradient.addColorStop(0.4, `rgba(${{red}}, ${{green}}, 0, 0.4)`);
-                    gradient.addColorStop(0.7, `rgba(${{red}}, ${{green}}, 0, 0.15)`);
-                    gradient.addColorStop(1, `rgba(${{red}}, ${{green}}, 0, 0)`);
-                    
-                    ctx.fillStyle = gradient;
-                    ctx.fillRect(x - glowRadius, y - glowRadius, glowRadius * 2, glowRadius * 2);
-                }}
-                
-                // Draw building marker
-                ctx.beginPath();
-                ctx.arc(x, y, radius, 0, Math.PI * 2);
-                ctx.fillStyle = color;
-                ctx.fill();
-                ctx.strokeStyle = 'rgba(0, 0, 0, 0.5)';
-                ctx.lineWidth = 2;
-                ctx.stroke();
-            }});
-            
+            // Heatmap glow effect (pre-rendered tiles)
+            if (heatmapMode && tiles) {{
+                drawTiles('glow');
+            }}
             ctx.restore();
+            
+            // Heatmap glow effect (cached layer), then the building markers
+            if (heatmapMode && !tiles) {{
+                drawLayer(getLayer('glow', paintGlow));
+            }}
+            drawLayer(getLayer('markers', paintMarkers));
         }}
         
         // Zoom functions
@@ -447,18 +742,38 @@ def generate_html(df, map_image_base64, output_file):
             draw();
         }}
         
-        // Mouse events
+        // Mouse events (drag to pan: one composite per frame, no re-rasterizing)
+        canvas.addEventListener('mousedown', (e) => {{
+            isDragging = true;
+            dragStartX = e.clientX;
+            dragStartY = e.clientY;
+        }});
+        
+        window.addEventListener('mouseup', () => {{
+            isDragging = false;
+        }});
+        
         canvas.addEventListener('mousemove', (e) => {{
             const rect = canvas.getBoundingClientRect();
-            const x = (e.clientX - rect.left - offsetX) / scale;
-            const y = (e.clientY - rect.top - offsetY) / scale;
+            if (isDragging) {{
+                offsetX += (e.clientX - dragStartX) * canvas.width / rect.width;
+                offsetY += (e.clientY - dragStartY) * canvas.height / rect.height;
+                dragStartX = e.clientX;
+                dragStartY = e.clientY;
+                tooltip.style.display = 'none';
+                requestDraw();
+                return;
+            }}
+            const s = baseScale * scale;
+            const x = ((e.clientX - rect.left) * canvas.width / rect.width - offsetX) / s;
+            const y = ((e.clientY - rect.top) * canvas.height / rect.height - offsetY) / s;
             
             let hoveredBuilding = null;
             buildings.forEach(building => {{
                 const dx = x - building.map_pixel_x;
                 const dy = y - building.map_pixel_y;
-                const radius = Math.max(8, Math.min(30, 5 + building.num_access_points * 1.5));
-                if (Math.sqrt(dx*dx + dy*dy) < radius) {{
+                const radius = markerRadius(building.num_access_points);
+                if (dx*dx + dy*dy < radius*radius) {{
                     hoveredBuilding = building;
                 }}
             }});
@@ -482,11 +797,33 @@ def generate_html(df, map_image_base64, output_file):
         canvas.addEventListener('mouseleave', () => {{
             tooltip.style.display = 'none';
         }});
+        
+        // Size the canvas to the page once the map size is known, redraw on resize
+        function start(width, height) {{
+            mapWidth = width;
+            mapHeight = height;
+            sizeCanvas();
+            window.addEventListener('resize', () => {{
+                sizeCanvas();
+                draw();
+            }});
+            draw();
+        }}
+        
+        // Load campus map image (or fetch tiles on demand)
+        const img = new Image();
+        if (tiles) {{
+            start(tiles.width, tiles.height);
+        }} else {{
+            img.src = '{map_image_src or ""}';
+            img.onload = () => start(mapSize ? mapSize[0] : img.width, mapSize ? mapSize[1] : img.height);
+        }}
     </script>
 </body>
 </html>'''
     
     # Write to file
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
     with open(output_file, 'w') as f:
         f.write(html_content)
     
@@ -495,23 +832,52 @@ def generate_html(df, map_image_base64, output_file):
     print(f"   Activity range: {min_activity}-{max_activity} APs")
 
 
-def main():
+def main(argv=None):
     """Generate the interactive heatmap visualization."""
     
+    parser = argparse.ArgumentParser(description="Generate the interactive campus heatmap page")
+    parser.add_argument('--data', default='data/building_locations_processed.csv')
+    parser.add_argument('--map-image', default='new-dartmouth-campus-map.png')
+    parser.add_argument('--output', default='interactive_campus_heatmap.html')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--inline', action='store_true',
+                      help="embed the map as a base64 data URI (single-file page)")
+    mode.add_argument('--tiles', action='store_true',
+                      help="write a tile pyramid next to the page instead of one map image")
+    parser.add_argument('--tiles-dir', default='tiles', help="tile pyramid dir, relative to the page")
+    parser.add_argument('--asset-dir', default='assets', help="map asset dir, relative to the page")
+    parser.add_argument('--asset-url', default=None,
+                        help="URL the page uses for the asset dir (default: --asset-dir), e.g. / for a site root")
+    parser.add_argument('--asset-format', choices=tuple(ASSET_FORMATS), default=None,
+                        help="re-encode the map (default: copy the original bytes)")
+    parser.add_argument('--asset-max-width', type=int, default=None, help="downscale the map to this width")
+    args = parser.parse_args(argv)
+    
     print("=" * 70)
     print("DARTMOUTH CAMPUS HEATMAP - VISUALIZATION GENERATOR")
     print("=" * 70)
     
     # Load processed data
-    df = load_processed_data('data/building_locations_processed.csv')
-    
-    # Encode campus map image
-    map_image = encode_campus_map_image('new-dartmouth-campus-map.png')
+    df = load_processed_data(args.data)
     
-    # Generate HTML
-    generate_html(df, map_image, 'interactive_campus_heatmap.html')
+    if args.tiles:
+        # Tile pyramid next to the page; nothing is inlined
+        tiles = write_tile_pyramid(args.map_image, df, Path(args.output).parent / args.tiles_dir)
+        generate_html(df, None, args.output, tiles=tiles, tiles_url=Path(args.tiles_dir).as_posix())
+    elif args.inline:
+        # Encode campus map image
+        map_image = encode_campus_map_image(args.map_image)
+        
+        # Generate HTML
+        generate_html(df, map_image, args.output)
+    else:
+        # Map as a separate, content-hashed file referenced by URL
+        asset, map_size = write_map_asset(args.map_image, Path(args.output).parent / args.asset_dir,
+                                          args.asset_max_width, args.asset_format)
+        url_dir = args.asset_url if args.asset_url is not None else Path(args.asset_dir).as_posix()
+        generate_html(df, f"{url_dir.rstrip('/')}/{asset.name}", args.output, map_size=map_size)
     
-    print("\n🎉 SUCCESS! Open 'interactive_campus_heatmap.html' in your browser.")
+    print(f"\n🎉 SUCCESS! Open '{args.output}' in your browser.")
     print("=" * 70)
 
 
@@ -37,11 +37,14 @@ def clean_location_data(input_file):
         DataFrame with cleaned data
     """
     print("📂 Loading raw data...")
-    # CSV has descriptive column names, so we'll specify them explicitly
+    # CSV has descriptive column names, so we'll specify them explicitly.
+    # z (floor) is dropped below anyway, so it is never parsed.
     df = pd.read_csv(input_file, 
                      names=['#AP', 'x', 'y', 'z'], 
                      skiprows=1,  # Skip header row
-                     usecols=[0, 1, 2, 3])  # Only read first 4 columns
+                     usecols=['#AP', 'x', 'y'],
+                     dtype={'#AP': str, 'x': 'float64', 'y': 'float64'},
+                     engine='c')
     print(f"   Original entries: {len(df)}")
     
     # Remove entries with unknown locations (-1 coordinates)
@@ -1,53 +1,368 @@
+# mapHeats.py
+# Heat map figures from the wifiProto outputs: a 2D KDE per campus and a 3D
+# floor scatter for HK. Nothing runs at import; use render_all() or the CLI:
+#   python mapHeats.py --out-dir outputs --fig-dir figures --weight User-Count
+# The KDE is grid-binned (histogram2d + FFT Gaussian smoothing), so its cost
+# depends on the grid size, not on the number of placed records.
+# `batch` renders many (campus, month, metric) heat maps headless (Agg canvas,
+# no pyplot) in worker processes, each reusing one figure for all its maps:
+#   python mapHeats.py batch --out-dir outputs/2021-01 --out-dir outputs/2021-02 --workers 4
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, List, Sequence, Tuple
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+
+from wifiProto import OUT_DIR
+
+# run_pipeline output readers, by file suffix (see wifiProto.write_output)
+OUTPUT_READERS = {".parquet": pd.read_parquet, ".feather": pd.read_feather, ".csv": pd.read_csv}
+
+FIG_DPI = 300
+
+# Density grid (defaults mirror seaborn.kdeplot: Scott bandwidth, 200 points, cut=3)
+KDE_GRID    = 200           # grid points per axis
+KDE_CUT     = 3             # grid extends this many bandwidths past the data
+KDE_LEVELS  = 10            # filled iso-proportion contours
+KDE_THRESH  = 0.05          # lowest contour: this share of the mass is left unshaded
+KDE_TRUNC   = 4.0           # Gaussian kernel truncated at this many sigmas
+KDE_MIN_BW  = 1e-5          # degrees (~1 m); bandwidth floor when every point shares a lat or lon
+SCATTER_MAX = 20_000        # points drawn over the density (seeded sample beyond this)
+
+# Batch rendering: campus -> deduped pipeline output, metric -> weight column (None = records)
+CAMPUSES = {
+    "dartmouth": ("dartmouth_placed_windowed_dedup_jan2015", "Dartmouth"),
+    "hk":        ("hk_placed_windowed_dedup_jan2015", "HK"),
+}
+METRICS = {"records": None, "users": "User-Count", "connections": "WiFi-Conn", "duration": "Duration-Sec"}
+BATCH_DPI     = 150
+BATCH_FIGSIZE = (8, 6)
+
+def read_output(stem, out_dir=OUT_DIR):
+    """Newest of <stem>.parquet / .feather / .csv; the columnar ones come back already typed."""
+    out_dir = Path(out_dir)
+    found = [out_dir / (stem + suffix) for suffix in OUTPUT_READERS]
+    found = [p for p in found if p.exists()]
+    if not found:
+        raise FileNotFoundError(f"no {stem}.parquet/.feather/.csv in {out_dir} (run wifiProto.py first?)")
+    path = max(found, key=lambda p: p.stat().st_mtime_ns)
+    return OUTPUT_READERS[path.suffix](path)
+
+# =============================================================================
+# Grid-binned KDE
+# =============================================================================
+def _points(df, weight=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(lon, lat, weights) for rows with coordinates and a positive weight."""
+    x = df["lon"].to_numpy(dtype=float)
+    y = df["lat"].to_numpy(dtype=float)
+    w = np.ones_like(x) if weight is None else df[weight].to_numpy(dtype=float)
+    keep = np.isfinite(x) & np.isfinite(y) & np.isfinite(w) & (w > 0)
+    if not keep.any():
+        raise ValueError("no placed points with coordinates" + (f" and {weight} > 0" if weight else ""))
+    return x[keep], y[keep], w[keep]
+
+def kde_bandwidth(x, y, w) -> np.ndarray:
+    """
+    2x2 Gaussian kernel covariance by Scott's rule on the weighted data
+    covariance (what seaborn/scipy gaussian_kde use), n = effective sample size.
+    """
+    neff = w.sum() ** 2 / (w ** 2).sum()
+    factor = neff ** (-1.0 / 6)
+    cov = np.cov(np.vstack([x, y]), aweights=w) if len(x) > 1 else np.zeros((2, 2))
+    cov = np.nan_to_num(np.atleast_2d(cov)) * factor ** 2
+    # A lone point or a line of points has no spread on some axis; borrow the other one
+    sx, sy = np.sqrt(np.diag(cov))
+    floor = max(sx, sy, KDE_MIN_BW) if min(sx, sy) == 0 else KDE_MIN_BW
+    for i, s in enumerate((sx, sy)):
+        if s < floor:
+            cov[i, i] = floor ** 2
+    return cov
+
+def _kernel(cov_cells) -> np.ndarray:
+    """Normalized Gaussian weights on integer cell offsets, truncated at KDE_TRUNC sigmas per axis."""
+    ry, rx = (int(np.ceil(KDE_TRUNC * np.sqrt(cov_cells[i, i]))) for i in (0, 1))
+    oy, ox = np.mgrid[-ry:ry + 1, -rx:rx + 1]
+    d = np.stack([oy, ox], axis=-1)
+    if np.linalg.det(cov_cells) > 0:
+        k = np.exp(-0.5 * np.einsum("...i,ij,...j->...", d, np.linalg.inv(cov_cells), d))
+    else:
+        k = ((oy == 0) & (ox == 0)).astype(float)   # degenerate kernel: no smoothing
+    return k / k.sum()
 
-# Load final placed data
-dart_df = pd.read_csv(r"C:\Users\lunes\Documents\Wifi-map\outputs\dartmouth_placed_windowed_dedup_jan2015.csv")
-hk_df   = pd.read_csv(r"C:\Users\lunes\Documents\Wifi-map\outputs\hk_placed_windowed_dedup_jan2015.csv")
+def _fft_convolve(a, k) -> np.ndarray:
+    """'same'-size 2D convolution of a with an odd-sized kernel, zero-padded (no wrap-around)."""
+    shape = (a.shape[0] + k.shape[0] - 1, a.shape[1] + k.shape[1] - 1)
+    full = np.fft.irfft2(np.fft.rfft2(a, shape) * np.fft.rfft2(k, shape), shape)
+    ry, rx = k.shape[0] // 2, k.shape[1] // 2
+    return full[ry:ry + a.shape[0], rx:rx + a.shape[1]]
 
-# Helper plotting function
-def plot_heatmap(df, title, out_path):
+def density_grid(x, y, w=None, gridsize=KDE_GRID, cut=KDE_CUT, bandwidth: Optional[np.ndarray] = None):
+    """
+    Weighted 2D Gaussian KDE evaluated on a gridsize x gridsize lattice:
+    points are binned onto the lattice with histogram2d, then convolved with
+    the (full-covariance) Gaussian kernel by FFT. Cost is O(points) for the
+    binning plus O(grid log grid) for the convolution.
+    Returns (xs, ys, density) with density[j, i] at (xs[i], ys[j]),
+    normalized to integrate to 1, ready for contourf.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    w = np.ones_like(x) if w is None else np.asarray(w, dtype=float)
+    cov = kde_bandwidth(x, y, w) if bandwidth is None else np.asarray(bandwidth, dtype=float)
+    sx, sy = np.sqrt(np.diag(cov))
+    xs = np.linspace(x.min() - cut * sx, x.max() + cut * sx, gridsize)
+    ys = np.linspace(y.min() - cut * sy, y.max() + cut * sy, gridsize)
+    dx, dy = xs[1] - xs[0], ys[1] - ys[0]
+
+    # Bins centred on the lattice points: each point lands on its nearest node
+    ex = np.concatenate([xs - dx / 2, [xs[-1] + dx / 2]])
+    ey = np.concatenate([ys - dy / 2, [ys[-1] + dy / 2]])
+    counts, _, _ = np.histogram2d(y, x, bins=(ey, ex), weights=w)
+
+    # Kernel covariance in (row, col) = (y, x) cell units
+    cells = np.array([[cov[1, 1] / dy ** 2, cov[0, 1] / (dx * dy)],
+                      [cov[0, 1] / (dx * dy), cov[0, 0] / dx ** 2]])
+    dens = _fft_convolve(counts, _kernel(cells))
+    np.clip(dens, 0, None, out=dens)    # FFT round-off can dip just below 0
+    return xs, ys, dens / (w.sum() * dx * dy)
+
+def iso_proportion_levels(density, thresh=KDE_THRESH, levels=KDE_LEVELS) -> np.ndarray:
+    """Density values enclosing 1 - q of the mass for q in linspace(thresh, 1), as seaborn draws them."""
+    values = np.sort(density.ravel())[::-1]
+    mass = np.cumsum(values) / values.sum()
+    idx = np.searchsorted(mass, 1 - np.linspace(thresh, 1, levels))
+    return np.unique(np.take(values, idx, mode="clip"))
+
+def _scatter_sample(x, y, max_points=SCATTER_MAX, seed=0):
+    if len(x) <= max_points:
+        return x, y
+    pick = np.random.default_rng(seed).choice(len(x), max_points, replace=False)
+    return x[pick], y[pick]
+
+# =============================================================================
+# Figures
+# =============================================================================
+def draw_heatmap(ax, df, title, weight=None):
+    """Filled KDE contours of lon/lat (weighted by the `weight` column if given) with the points on top."""
+    x, y, w = _points(df, weight)
+    xs, ys, dens = density_grid(x, y, w)
+    ax.contourf(xs, ys, dens, levels=iso_proportion_levels(dens), cmap="Reds")
+    px, py = _scatter_sample(x, y)
+    ax.scatter(px, py, s=10, alpha=0.3, c="black")
+    ax.set_title(title, fontsize=14)
+    ax.set_xlabel("Longitude")
+    ax.set_ylabel("Latitude")
+    ax.axis("equal")
+
+def plot_heatmap(df, title, out_path, dpi=FIG_DPI, show=False, weight=None):
     plt.figure(figsize=(8,6))
-    sns.kdeplot(
-        x=df["lon"], y=df["lat"],
-        cmap="Reds", shade=True, fill=True, thresh=0.05
+    draw_heatmap(plt.gca(), df, title, weight)
+    plt.tight_layout()
+    plt.savefig(out_path, dpi=dpi)
+    if show:
+        plt.show()
+    plt.close()
+
+def plot_floors_3d(df, title, out_path, dpi=FIG_DPI, show=False):
+    """lon/lat/Floor scatter, coloured by floor."""
+    pts = df.dropna(subset=["lat", "lon", "Floor"])
+    floor = pts["Floor"].astype(float)
+
+    fig = plt.figure(figsize=(10, 7))
+    ax = fig.add_subplot(111, projection='3d')
+
+    # color by floor for clarity
+    sc = ax.scatter(
+        pts["lon"], pts["lat"], floor,
+        c=floor, cmap='plasma', s=20, alpha=0.6
     )
-    plt.scatter(df["lon"], df["lat"], s=10, alpha=0.3, c="black")
-    plt.title(title, fontsize=14)
-    plt.xlabel("Longitude")
-    plt.ylabel("Latitude")
-    plt.axis("equal")
+
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    ax.set_zlabel('Floor')
+    ax.set_title(title)
+
+    fig.colorbar(sc, ax=ax, label='Floor')
     plt.tight_layout()
-    plt.savefig(out_path, dpi=300)
-    plt.show()
-
-# Plot Dartmouth heatmap
-plot_heatmap(dart_df, "Dartmouth Wi-Fi Heat Map (Jan 2015)", r"C:\Users\lunes\Documents\Wifi-map\outputs\dart_heatmap.png")
-
-# Plot Hong Kong heatmap
-plot_heatmap(hk_df, "HK Wi-Fi Heat Map (Jan 2015)", r"C:\Users\lunes\Documents\Wifi-map\outputs\hk_heatmap.png")
-
-# Prepare HK data
-hk_3d = hk_df.dropna(subset=["lat", "lon", "Floor"])
-hk_3d["Floor"] = hk_3d["Floor"].astype(float)
-
-# Plot 3D
-fig = plt.figure(figsize=(10, 7))
-ax = fig.add_subplot(111, projection='3d')
-
-# color by floor for clarity
-sc = ax.scatter(
-    hk_3d["lon"], hk_3d["lat"], hk_3d["Floor"],
-    c=hk_3d["Floor"], cmap='plasma', s=20, alpha=0.6
-)
-
-ax.set_xlabel('Longitude')
-ax.set_ylabel('Latitude')
-ax.set_zlabel('Floor')
-ax.set_title('Hong Kong Wi-Fi 3D Building Heat Map (Jan 2015)')
-
-fig.colorbar(sc, ax=ax, label='Floor')
-plt.tight_layout()
-plt.savefig(r"C:\Users\lunes\Documents\Wifi-map\outputs\hk_3d_heatmap.png", dpi=300)
-plt.show()
+    plt.savefig(out_path, dpi=dpi)
+    if show:
+        plt.show()
+    plt.close(fig)
+
+def render_all(out_dir=OUT_DIR, fig_dir=None, dpi=FIG_DPI, show=False, weight=None) -> List[Path]:
+    """
+    Every figure from the deduped outputs in out_dir, saved to fig_dir
+    (default: out_dir). weight names the column the heat maps are weighted by.
+    """
+    out_dir = Path(out_dir)
+    fig_dir = out_dir if fig_dir is None else Path(fig_dir)
+    fig_dir.mkdir(parents=True, exist_ok=True)
+
+    # Load final placed data
+    dart_df = read_output("dartmouth_placed_windowed_dedup_jan2015", out_dir)
+    hk_df   = read_output("hk_placed_windowed_dedup_jan2015", out_dir)
+
+    written = [fig_dir / "dart_heatmap.png", fig_dir / "hk_heatmap.png", fig_dir / "hk_3d_heatmap.png"]
+    plot_heatmap(dart_df, "Dartmouth Wi-Fi Heat Map (Jan 2015)", written[0], dpi, show, weight)
+    plot_heatmap(hk_df, "HK Wi-Fi Heat Map (Jan 2015)", written[1], dpi, show, weight)
+    plot_floors_3d(hk_df, "Hong Kong Wi-Fi 3D Building Heat Map (Jan 2015)", written[2], dpi, show)
+    return written
+
+# =============================================================================
+# Batch rendering (headless, process pool, one reused figure per worker)
+# =============================================================================
+@dataclass(frozen=True)
+class RenderJob:
+    out_dir: Path             # run_pipeline output dir holding the campus file
+    campus: str               # key of CAMPUSES
+    month: Optional[str]      # "YYYY-MM" of the timestamp column; None = every row
+    metric: str               # key of METRICS
+
+    def filename(self) -> str:
+        return f"{self.campus}_{self.month or 'all'}_{self.metric}.png"
+
+def output_months(df) -> List[str]:
+    """YYYY-MM months present in a placed output's timestamp column."""
+    ts = pd.to_datetime(df["timestamp"])
+    return sorted(ts.dt.strftime("%Y-%m").dropna().unique())
+
+def batch_jobs(out_dirs: Sequence[Path],
+               campuses: Sequence[str] = tuple(CAMPUSES),
+               metrics: Sequence[str] = tuple(METRICS),
+               months: Optional[Sequence[str]] = None) -> List[RenderJob]:
+    """
+    One job per (out dir, campus, month, metric). months=None takes every
+    month in each output (run_pipeline remaps into one month, so a year of
+    maps is usually twelve output dirs, one pipeline run per month).
+    """
+    unknown = sorted(set(campuses) - set(CAMPUSES)) + sorted(set(metrics) - set(METRICS))
+    if unknown:
+        raise ValueError(f"unknown campuses/metrics {unknown}; expected {tuple(CAMPUSES)} / {tuple(METRICS)}")
+    jobs = []
+    for out_dir in map(Path, out_dirs):
+        for campus in campuses:
+            found = months or output_months(read_output(CAMPUSES[campus][0], out_dir))
+            jobs += [RenderJob(out_dir, campus, m, metric) for m in found for metric in metrics]
+    return jobs
+
+# Per-worker state: the reused figure (with its initial subplot params) and the outputs read so far
+_canvas: Optional[Tuple[Figure, Axes, Dict[str, float]]] = None
+_frames: Dict[Tuple[Path, str], pd.DataFrame] = {}
+
+def _worker_axes():
+    """
+    This process's figure and axes, cleared for the next map (created on first
+    use). The subplot params go back to their initial values too, otherwise
+    tight_layout would start from the previous map's and drift.
+    """
+    global _canvas
+    if _canvas is None:
+        fig = Figure(figsize=BATCH_FIGSIZE)
+        FigureCanvasAgg(fig)
+        pars = {k: getattr(fig.subplotpars, k) for k in ("left", "right", "bottom", "top", "wspace", "hspace")}
+        _canvas = fig, fig.add_subplot(111), pars
+    fig, ax, pars = _canvas
+    ax.clear()
+    fig.subplots_adjust(**pars)
+    return fig, ax
+
+def _job_frame(job: RenderJob) -> pd.DataFrame:
+    key = (job.out_dir, job.campus)
+    if key not in _frames:
+        _frames.clear()   # jobs arrive grouped by output; keep only the current one
+        df = read_output(CAMPUSES[job.campus][0], job.out_dir)
+        df["_month"] = pd.to_datetime(df["timestamp"]).dt.strftime("%Y-%m")
+        _frames[key] = df
+    df = _frames[key]
+    return df if job.month is None else df[df["_month"] == job.month]
+
+def render_job(job: RenderJob, fig_dir: Path, dpi: int = BATCH_DPI) -> Optional[Path]:
+    """
+    Render one job onto this process's reused figure. None (and no file) if the
+    month has no placed points, or none with a positive weight for the metric,
+    so one degenerate job does not fail the whole batch.
+    """
+    df = _job_frame(job)
+    weight = METRICS[job.metric]
+    usable = df["lat"].notna() & df["lon"].notna()
+    if weight is not None:
+        usable &= pd.to_numeric(df[weight], errors="coerce") > 0
+    if not usable.any():
+        return None
+    fig, ax = _worker_axes()
+    label = CAMPUSES[job.campus][1]
+    draw_heatmap(ax, df, f"{label} Wi-Fi Heat Map ({job.month or 'all'}, {job.metric})", weight)
+    fig.tight_layout()
+    path = Path(fig_dir) / job.filename()
+    fig.savefig(path, dpi=dpi)
+    return path
+
+def _render_chunk(jobs: Sequence[RenderJob], fig_dir: Path, dpi: int) -> List[Optional[Path]]:
+    return [render_job(j, fig_dir, dpi) for j in jobs]
+
+def render_batch(jobs: Sequence[RenderJob],
+                 fig_dir: Path,
+                 workers: int = 1,
+                 dpi: int = BATCH_DPI) -> List[Optional[Path]]:
+    """
+    Render every job to fig_dir/<campus>_<month>_<metric>.png. Jobs are split
+    into contiguous runs per worker (so each output file is read once per
+    worker) and results come back in job order. workers=1 renders in-process.
+    """
+    fig_dir = Path(fig_dir)
+    fig_dir.mkdir(parents=True, exist_ok=True)
+    jobs = list(jobs)
+    if workers <= 1 or len(jobs) <= 1:
+        return _render_chunk(jobs, fig_dir, dpi)
+    bounds = np.linspace(0, len(jobs), min(workers, len(jobs)) + 1).astype(int)
+    chunks = [jobs[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        futs = [pool.submit(_render_chunk, c, fig_dir, dpi) for c in chunks]
+        return [p for f in futs for p in f.result()]
+
+def batch_main(args) -> List[Optional[Path]]:
+    jobs = batch_jobs(args.batch_out_dirs or [args.out_dir], args.campuses.split(","), args.metrics.split(","),
+                      args.months.split(",") if args.months else None)
+    written = render_batch(jobs, args.batch_fig_dir, workers=args.workers, dpi=args.batch_dpi)
+    print(f"Batch render complete -> {args.batch_fig_dir}")
+    print(f" - maps written: {sum(p is not None for p in written)} of {len(jobs)} jobs")
+    return written
+
+def main(argv: Optional[Sequence[str]] = None) -> List[Path]:
+    ap = argparse.ArgumentParser(description="Heat map figures from the wifiProto outputs")
+    sub = ap.add_subparsers(dest="cmd")
+    b = sub.add_parser("batch", help="headless (campus, month, metric) heat maps in worker processes")
+    # Own dests: sharing the top-level ones would let these defaults overwrite them
+    b.add_argument("--out-dir", dest="batch_out_dirs", type=Path, action="append", default=None,
+                   help="run_pipeline output dir (repeatable; default: the top-level --out-dir)")
+    b.add_argument("--fig-dir", dest="batch_fig_dir", type=Path, required=True, help="where the maps go")
+    b.add_argument("--campuses", default=",".join(CAMPUSES), help=f"subset of {','.join(CAMPUSES)}")
+    b.add_argument("--metrics", default=",".join(METRICS), help=f"subset of {','.join(METRICS)}")
+    b.add_argument("--months", default=None, help="YYYY-MM list (default: every month in each output)")
+    b.add_argument("--workers", type=int, default=1, help="worker processes (1 = in-process)")
+    b.add_argument("--dpi", dest="batch_dpi", type=int, default=BATCH_DPI)
+
+    ap.add_argument("--out-dir", type=Path, default=OUT_DIR, help="run_pipeline output dir to read")
+    ap.add_argument("--fig-dir", type=Path, default=None, help="where figures go (default: --out-dir)")
+    ap.add_argument("--dpi", type=int, default=FIG_DPI)
+    ap.add_argument("--weight", default=None,
+                    help="column to weight the heat maps by, e.g. User-Count, WiFi-Conn, Duration-Sec")
+    ap.add_argument("--show", action="store_true", help="also open each figure in a window")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "batch":
+        return batch_main(args)
+    written = render_all(args.out_dir, args.fig_dir, dpi=args.dpi, show=args.show, weight=args.weight)
+    for p in written:
+        print(" -", p)
+    return written
+
+if __name__ == "__main__":
+    main()
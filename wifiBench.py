@@ -0,0 +1,253 @@
+# wifiBench.py
+# Benchmark harness for the wifiProto pipeline stages.
+# Builds synthetic record sets (10k .. 10M rows, with or without RSSI signal
+# lists) shaped after the shipped CSVs, times each stage and records its peak
+# RSS, and writes a JSON report that can be diffed against another commit's:
+#   python wifiBench.py --sizes 10k,100k,1M --out bench.json
+#   python wifiBench.py --sizes 10k,100k,1M --out new.json --compare bench.json
+# Runs offline; no input beyond the repo's own CSVs.
+
+import gc
+import json
+import time
+import platform
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Optional, Any, Callable, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+import wifiProto as wp
+from wifiStore import DATAVERSE_DIR, REPO_DIR, SCHEMAS, list_month_files
+from wifiTrace import current_rss, peak_rss, reset_peak_rss
+
+
+# =============================================================================
+# PATHS / defaults
+# =============================================================================
+AP_TEMPLATE  = REPO_DIR / "campus-heatmap-visualization" / "data" / "dartmouth-location-data.csv"
+HK_TEMPLATE  = DATAVERSE_DIR            # first daily month: count/duration distributions + dates
+
+SIZES        = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+DEFAULT_SIZES = ("10k", "100k", "1M")   # 10M with signal lists needs several GB of RAM
+SCALAR_ROWS  = 20_000                   # row-by-row stages (place_point, estimate_from_rssi) are capped
+GPS_SHARE    = 0.05                     # records that already carry lat/lon
+DEVICE_RATIO = 10                       # records per synthetic device
+
+
+# =============================================================================
+# Synthetic data shaped after the shipped CSVs
+# =============================================================================
+def load_hk_template(hk_dir: Path = HK_TEMPLATE) -> pd.DataFrame:
+    """Date + counts of the first HK daily month (distributions for synthetic_records)."""
+    files = list_month_files("daily", src_dir=hk_dir)
+    if not files:
+        raise FileNotFoundError(f"no <YYYYMM>-wifi-raw.csv template in {hk_dir}")
+    return SCHEMAS["daily"].read_csv(files[0].path, columns=["Date", "User-Count", "WiFi-Conn", "Duration-Sec"])
+
+
+def load_templates(ap_csv: Path = AP_TEMPLATE, hk_dir: Path = HK_TEMPLATE):
+    """(ap_lookup, floor_centroids, hk_rows): Dartmouth APs + one HK daily month of counts."""
+    ap_lookup, floor_centroids = wp.build_dartmouth_ap_lookup(ap_csv)
+    return ap_lookup, floor_centroids, load_hk_template(hk_dir)
+
+
+def synthetic_records(n: int,
+                      ap_lookup: pd.DataFrame,
+                      hk: pd.DataFrame,
+                      signals: bool = False,
+                      seed: int = 0) -> pd.DataFrame:
+    """
+    n records with the columns place_points/window_and_dedupe read: timestamp,
+    Floor (Dartmouth floors, ~2% missing), counts resampled from the HK template,
+    device_id, id, GPS on GPS_SHARE of rows, and optionally 1-6 RSSI readings
+    per record (~5% naming APs absent from the lookup).
+    """
+    rng = np.random.default_rng(seed)
+    days = hk["Date"].drop_duplicates().to_numpy()
+    ts = days[rng.integers(0, len(days), n)] + rng.integers(0, 86_400, n).astype("timedelta64[s]")
+    floors = ap_lookup["Floor"].to_numpy(dtype=float)[rng.integers(0, len(ap_lookup), n)]
+    floors[rng.random(n) < 0.02] = np.nan
+    pick = rng.integers(0, len(hk), n)
+
+    df = pd.DataFrame({
+        "timestamp": ts,
+        "Floor": floors,
+        "User-Count": hk["User-Count"].to_numpy()[pick],
+        "WiFi-Conn": hk["WiFi-Conn"].to_numpy()[pick],
+        "Duration-Sec": hk["Duration-Sec"].to_numpy()[pick],
+        "device_id": pd.Series(rng.integers(0, max(n // DEVICE_RATIO, 1), n)).map("dev{}".format),
+        "id": np.arange(n),
+    })
+    gps = rng.random(n) < GPS_SHARE
+    src = rng.integers(0, len(ap_lookup), n)
+    df["lat"] = np.where(gps, ap_lookup["lat"].to_numpy()[src] + rng.normal(0, 1e-5, n), np.nan)
+    df["lon"] = np.where(gps, ap_lookup["lon"].to_numpy()[src] + rng.normal(0, 1e-5, n), np.nan)
+
+    if signals:
+        counts = rng.integers(1, 7, n)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        names = np.append(ap_lookup["AP"].to_numpy(dtype=object), "UnknownAP")
+        ap_pick = np.where(rng.random(offsets[-1]) < 0.05, len(names) - 1,
+                           rng.integers(0, len(names) - 1, offsets[-1]))
+        aps = names[ap_pick].tolist()
+        rssi = rng.integers(-90, -35, offsets[-1]).tolist()
+        df["signals"] = [[{"ap": aps[j], "rssi": rssi[j]} for j in range(offsets[i], offsets[i + 1])]
+                         for i in range(n)]
+    return df
+
+
+# =============================================================================
+# Timing
+# =============================================================================
+def measure(fn: Callable[[], Any], repeat: int = 1) -> Dict[str, Any]:
+    """Best-of-`repeat` wall time, plus peak RSS over the runs. Returns the last result too."""
+    walls = []
+    gc.collect()
+    rss_before = current_rss()
+    per_stage = reset_peak_rss()
+    result = None
+    for _ in range(repeat):
+        result = None   # drop the previous run's output before the next one
+        t0 = time.perf_counter()
+        result = fn()
+        walls.append(time.perf_counter() - t0)
+    return dict(wall_s=min(walls), wall_s_all=walls, rss_before_bytes=rss_before,
+                peak_rss_bytes=peak_rss(), peak_rss_scope="stage" if per_stage else "process",
+                result=result)
+
+
+def bench_size(label: str,
+               n: int,
+               signals: bool,
+               ap_lookup: pd.DataFrame,
+               floor_centroids: pd.DataFrame,
+               hk: pd.DataFrame,
+               repeat: int = 1,
+               seed: int = 0) -> List[Dict[str, Any]]:
+    """Every stage on one synthetic record set; one result dict per stage."""
+    t0 = time.perf_counter()
+    df = synthetic_records(n, ap_lookup, hk, signals=signals, seed=seed)
+    gen_s = time.perf_counter() - t0
+    ap_index = wp.APIndex.from_lookup(ap_lookup)
+    small = df.iloc[:min(n, SCALAR_ROWS)]
+
+    stages: List[tuple] = [
+        ("remap_to_month_year", n, lambda: wp.remap_to_month_year(df, "timestamp", 2015, 1)),
+        ("place_points", n, lambda: wp.place_points(df, ap_index, floor_centroids)),
+        ("place_point", len(small),
+         lambda: [wp.place_point(r, ap_index, floor_centroids) for _, r in small.iterrows()]),
+    ]
+    if signals:
+        sigs = df["signals"].to_numpy()
+        fl = df["Floor"].to_numpy()
+        stages += [
+            ("estimate_from_rssi", len(small),
+             lambda: [wp.estimate_from_rssi(s, ap_index, None if np.isnan(f) else int(f))
+                      for s, f in zip(sigs[:len(small)], fl[:len(small)])]),
+            ("estimate_from_rssi_batch", n,
+             lambda: wp.estimate_from_rssi_batch(*wp.flatten_signals(sigs, ap_index), ap_index, fl)),
+        ]
+
+    results = []
+    placed = None
+    for name, rows, fn in stages:
+        m = measure(fn, repeat)
+        if name == "place_points":
+            placed = pd.concat([df.drop(columns=["lat", "lon"]), m["result"]], axis=1)
+        del m["result"]
+        results.append(dict(stage=name, size=label, records=rows, signals=signals,
+                            rows_per_s=rows / m["wall_s"] if m["wall_s"] > 0 else None, **m))
+
+    m = measure(lambda: wp.window_and_dedupe(placed, window="1D"), repeat)
+    del m["result"]
+    results.append(dict(stage="window_and_dedupe", size=label, records=n, signals=signals,
+                        rows_per_s=n / m["wall_s"] if m["wall_s"] > 0 else None, **m))
+    for r in results:
+        r["generate_s"] = gen_s
+    return results
+
+
+# =============================================================================
+# Report
+# =============================================================================
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes: Sequence[str] = DEFAULT_SIZES,
+                   signals: Sequence[bool] = (False, True),
+                   repeat: int = 1,
+                   seed: int = 0) -> Dict[str, Any]:
+    """Full report: environment metadata + one result per (stage, size, signals)."""
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        raise ValueError(f"unknown sizes {unknown}; expected some of {tuple(SIZES)}")
+
+    # Only the AP lookup build is timed; the HK template parse is not part of any stage
+    hk = load_hk_template()
+    m = measure(lambda: wp.build_dartmouth_ap_lookup(AP_TEMPLATE), repeat)
+    ap_lookup, floor_centroids = m.pop("result")
+    results = [dict(stage="build_dartmouth_ap_lookup", size=None, records=len(ap_lookup),
+                    signals=False, rows_per_s=len(ap_lookup) / m["wall_s"], **m)]
+
+    for label in sizes:
+        for sig in signals:
+            print(f"  {label:>5} signals={sig!s:<5} ...", flush=True)
+            results += bench_size(label, SIZES[label], sig, ap_lookup, floor_centroids, hk,
+                                  repeat=repeat, seed=seed)
+
+    meta = dict(commit=_git_commit(), created=pd.Timestamp.now("UTC").isoformat(),
+                python=platform.python_version(), numpy=np.__version__, pandas=pd.__version__,
+                platform=platform.platform(), machine=platform.machine(),
+                sizes=list(sizes), repeat=repeat, seed=seed, scalar_rows=SCALAR_ROWS)
+    return dict(meta=meta, results=results)
+
+
+def compare(new: Dict[str, Any], old: Dict[str, Any]) -> pd.DataFrame:
+    """Per (stage, size, signals) in both reports: wall time and peak RSS, with new/old ratios."""
+    cols = ["stage", "size", "signals", "wall_s", "peak_rss_bytes"]
+    a = pd.DataFrame(old["results"])[cols]
+    b = pd.DataFrame(new["results"])[cols]
+    out = a.merge(b, on=["stage", "size", "signals"], how="inner", suffixes=("_old", "_new"))
+    out["time_ratio"] = out["wall_s_new"] / out["wall_s_old"]
+    out["rss_ratio"] = out["peak_rss_bytes_new"] / out["peak_rss_bytes_old"]
+    return out
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Benchmark the wifiProto pipeline stages")
+    ap.add_argument("--sizes", default=",".join(DEFAULT_SIZES),
+                    help=f"comma-separated subset of {','.join(SIZES)}")
+    ap.add_argument("--signals", choices=("both", "with", "without"), default="both",
+                    help="record sets with RSSI signal lists, without, or both")
+    ap.add_argument("--repeat", type=int, default=1, help="runs per stage (best wall time is kept)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", type=Path, default=Path("bench.json"))
+    ap.add_argument("--compare", type=Path, default=None, help="earlier report to compare against")
+    args = ap.parse_args(argv)
+
+    signals = {"both": (False, True), "with": (True,), "without": (False,)}[args.signals]
+    report = run_benchmarks(args.sizes.split(","), signals, repeat=args.repeat, seed=args.seed)
+    args.out.write_text(json.dumps(report, indent=1))
+    print(f"Benchmark report -> {args.out}")
+
+    table = pd.DataFrame(report["results"])
+    table["peak_rss_mb"] = table["peak_rss_bytes"] / 2**20
+    print(table[["stage", "size", "signals", "records", "wall_s", "rows_per_s", "peak_rss_mb"]]
+          .to_string(index=False, float_format=lambda v: f"{v:,.3f}"))
+    if args.compare:
+        diff = compare(report, json.loads(args.compare.read_text()))
+        print(f"\nvs {args.compare} (ratio > 1 = slower / larger now)")
+        print(diff[["stage", "size", "signals", "time_ratio", "rss_ratio"]]
+              .to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+
+if __name__ == "__main__":
+    main()
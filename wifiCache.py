@@ -0,0 +1,122 @@
+# wifiCache.py
+# Content-addressed, size-bounded on-disk cache for pipeline stage results.
+# A stage's key is sha256 over: stage name, the source of the modules that
+# compute it, each input file's (path, size, mtime_ns) fingerprint, and its
+# parameters. Results are stored as one Parquet file per returned DataFrame:
+#   <cache>/<key[:2]>/<key>/<i>.parquet
+# The entry directory's mtime is its last use; put() evicts least recently
+# used entries until the cache fits in max_bytes.
+
+import os
+import json
+import shutil
+import hashlib
+from pathlib import Path
+from typing import Optional, Any, Callable, Iterable, List, Sequence, Tuple
+
+import pandas as pd
+
+
+# =============================================================================
+# Keys
+# =============================================================================
+def file_fingerprint(path: Path) -> Tuple[str, int, int]:
+    """(resolved path, size, mtime_ns): changes whenever the file is rewritten."""
+    p = Path(path).resolve()
+    st = p.stat()
+    return str(p), st.st_size, st.st_mtime_ns
+
+
+def _source_digest(path: Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def stage_key(stage: str,
+              inputs: Iterable[Path] = (),
+              code: Iterable[Path] = (),
+              **params: Any) -> str:
+    """
+    Cache key for one stage. `code` lists the source files whose edits must
+    invalidate the result (hashed by content); `params` must be JSON-able
+    (tuples become lists, so (2015, 1) and [2015, 1] give the same key).
+    """
+    payload = dict(stage=stage,
+                   inputs=[file_fingerprint(p) for p in inputs],
+                   code=[_source_digest(p) for p in code],
+                   params=params)
+    blob = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+class StageCache:
+    """
+    get/put lists of DataFrames by stage_key(). root=None disables caching
+    (every get misses, put is a no-op), so callers need no separate branch.
+    """
+
+    def __init__(self, root: Optional[Path], max_bytes: int = 1 << 30):
+        self.root = None if root is None else Path(root)
+        self.max_bytes = max_bytes
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> Optional[List[pd.DataFrame]]:
+        if self.root is None:
+            return None
+        d = self._entry(key)
+        if not (d / "DONE").exists():
+            return None
+        n = int((d / "DONE").read_text())
+        frames = [pd.read_parquet(d / f"{i}.parquet") for i in range(n)]
+        os.utime(d)   # mark as recently used
+        return frames
+
+    def put(self, key: str, frames: Sequence[pd.DataFrame]) -> None:
+        if self.root is None:
+            return
+        d = self._entry(key)
+        tmp = d.with_name(d.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for i, df in enumerate(frames):
+            df.to_parquet(tmp / f"{i}.parquet")
+        (tmp / "DONE").write_text(str(len(frames)))
+        shutil.rmtree(d, ignore_errors=True)
+        os.replace(tmp, d)
+        self.evict()
+
+    def entries(self) -> List[Tuple[Path, int, int]]:
+        """(entry dir, bytes, last-use mtime_ns) for every complete entry."""
+        if self.root is None or not self.root.is_dir():
+            return []
+        out = []
+        for d in self.root.glob("??/*"):
+            if (d / "DONE").exists():
+                size = sum(f.stat().st_size for f in d.iterdir())
+                out.append((d, size, d.stat().st_mtime_ns))
+        return out
+
+    def evict(self) -> List[Path]:
+        """Drop least recently used entries until the total fits in max_bytes."""
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for d, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(d, ignore_errors=True)
+            total -= size
+            removed.append(d)
+        return removed
+
+    def cached(self, key: str, compute: Callable[[], Sequence[pd.DataFrame]]) -> List[pd.DataFrame]:
+        """get(key), or compute() and put the result."""
+        frames = self.get(key)
+        if frames is None:
+            frames = list(compute())
+            self.put(key, frames)
+        return frames
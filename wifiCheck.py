@@ -0,0 +1,183 @@
+# wifiCheck.py
+# Parity checks: the vectorized/streamed pipeline paths against the original
+# row-wise / in-memory code they replaced. Runs offline on the repo's own data:
+#   python wifiCheck.py                 # every check
+#   python wifiCheck.py --only place_points --rows 10000
+# Prints one line per check case and exits 1 if any of them disagree.
+
+import io
+import inspect
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+from typing import Optional, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import wifiProto as wp
+from wifiBench import load_templates, synthetic_records
+from wifiStore import DATAVERSE_DIR, list_month_files, stream_floor_daily
+
+
+# =============================================================================
+# Checks: each returns [(case, problems)] with problems == [] on a match
+# =============================================================================
+Result = List[Tuple[str, List[str]]]
+
+
+def _values(s: pd.Series) -> pd.Series:
+    """Numeric columns as float64 (so Int64/int/float floors compare equal), the rest as objects."""
+    num = pd.to_numeric(s, errors="coerce")
+    out = num.astype(float) if num.notna().sum() == s.notna().sum() else s.astype(object)
+    return out.reset_index(drop=True)
+
+
+def _compare_frames(new: pd.DataFrame, old: pd.DataFrame, exact: Sequence[str] = (),
+                    close: Sequence[str] = (), atol: float = 1e-12) -> List[str]:
+    """Column-by-column differences (values only, dtypes ignored); [] when they agree."""
+    problems = []
+    if len(new) != len(old):
+        return [f"{len(new)} rows vs {len(old)}"]
+    for c in exact:
+        a, b = _values(new[c]), _values(old[c])
+        bad = int((~((a == b) | (a.isna() & b.isna()))).sum())
+        if bad:
+            problems.append(f"{c}: {bad} rows differ")
+    for c in close:
+        a = new[c].to_numpy(dtype=float, na_value=np.nan)
+        b = old[c].to_numpy(dtype=float, na_value=np.nan)
+        if not np.array_equal(np.isnan(a), np.isnan(b)):
+            problems.append(f"{c}: NaN positions differ")
+        elif np.nanmax(np.abs(a - b), initial=0.0) > atol:
+            problems.append(f"{c}: max |diff| {np.nanmax(np.abs(a - b)):.3g}")
+    return problems
+
+
+def check_place_points(rows: int = 3_000, seed: int = 0) -> Result:
+    """
+    place_points vs the row-wise apply(place_point).apply(pd.Series) it replaced,
+    on synthetic GPS/RSSI/floor-only/unplaced records, with and without an AP lookup.
+    Values only: place_points gives a nullable Int64 floor where the row-wise
+    path left float64 (object for some mixes).
+    """
+    ap_lookup, floor_centroids, hk = load_templates()
+    df = synthetic_records(rows, ap_lookup, hk, signals=True, seed=seed)
+    ap_index = wp.APIndex.from_lookup(ap_lookup)
+    out = []
+    for case, lookup in (("with AP lookup", ap_index), ("no AP lookup", None)):
+        new = wp.place_points(df, lookup, floor_centroids)
+        old = df.apply(lambda r: wp.place_point(r, lookup, floor_centroids), axis=1).apply(pd.Series)
+        out.append((f"{case}, {rows} records",
+                    _compare_frames(new, old, exact=("floor", "source", "confidence"), close=("lat", "lon"))))
+    return out
+
+
+def _floor_daily_in_memory(start, end, src_dir=DATAVERSE_DIR) -> pd.DataFrame:
+    """
+    The pre-streaming HK aggregate: whole files read at once, one groupby.
+    User-Group "Total" rows are left out, as stream_floor_daily now does.
+    """
+    files = list_month_files("daily", start, end, src_dir=src_dir)
+    hk = pd.concat([pd.read_csv(f.path, parse_dates=["Date"]) for f in files], ignore_index=True)
+    hk = hk[hk["User-Group"] != "Total"]
+    return (hk.groupby(["Date", "Floor"], dropna=False)
+              .agg({"User-Count": "sum", "WiFi-Conn": "sum", "Duration-Sec": "sum"})
+              .reset_index())
+
+
+def check_hk_stream(ranges: Sequence[Tuple[str, str]] = ((wp.HK_START, wp.HK_END), ("2020-12", "2021-02")),
+                    chunksize: int = 5_000) -> Result:
+    """
+    stream_floor_daily (chunked, merged across months) vs the in-memory
+    read + groupby it replaced in run_pipeline. The small chunksize makes
+    chunks straddle days and month files.
+    """
+    out = []
+    for start, end in ranges:
+        new = stream_floor_daily(start, end, chunksize=chunksize)
+        old = _floor_daily_in_memory(start, end)
+        keys = ["Date", "Floor"]
+        new = new.assign(Floor=new["Floor"].astype(str)).sort_values(keys, ignore_index=True)
+        old = old.assign(Floor=old["Floor"].astype(str)).sort_values(keys, ignore_index=True)
+        out.append((f"{start}..{end}, {chunksize}-row chunks",
+                    _compare_frames(new, old, exact=keys + ["User-Count", "WiFi-Conn", "Duration-Sec"])))
+    return out
+
+
+def check_output_formats(compressions: Sequence[Optional[str]] = (None, "zstd")) -> Result:
+    """
+    One default-config run_pipeline (HK_START..HK_END, demo Dartmouth
+    aggregate) written as CSV, Parquet and Feather: the two columnar reads must be equal,
+    dtypes included, and write the same bytes as the CSV output once turned
+    back into CSV text. compression=None must leave both columnar formats
+    uncompressed.
+    """
+    import pyarrow.parquet as pq
+
+    out = []
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        tmp = Path(tmp)
+        common = dict(use_cache=False)
+        csv_files = wp.run_pipeline(out_dir=tmp / "csv", out_format="csv", **common)
+        for codec in compressions:
+            pq_files = wp.run_pipeline(out_dir=tmp / f"parquet-{codec}", out_format="parquet",
+                                       compression=codec, **common)
+            fe_files = wp.run_pipeline(out_dir=tmp / f"feather-{codec}", out_format="feather",
+                                       compression=codec, **common)
+            for c, p, f in zip(csv_files, pq_files, fe_files):
+                problems = []
+                a, b = pd.read_parquet(p), pd.read_feather(f)
+                if not a.equals(b) or not a.dtypes.equals(b.dtypes):
+                    problems.append("parquet and feather reads differ")
+                if a.to_csv(index=False).encode() != c.read_bytes():
+                    problems.append("parquet -> CSV text differs from the CSV output")
+                if codec is None:
+                    meta = pq.ParquetFile(p).metadata
+                    used = {meta.row_group(g).column(i).compression
+                            for g in range(meta.num_row_groups) for i in range(meta.num_columns)}
+                    ref = tmp / "uncompressed.feather"
+                    b.to_feather(ref, compression="uncompressed")
+                    if used != {"UNCOMPRESSED"} or ref.read_bytes() != f.read_bytes():
+                        problems.append(f"compression=None compressed the output (parquet: {sorted(used)})")
+                out.append((f"{c.stem}, compression={codec}", problems))
+    return out
+
+
+CHECKS: Dict[str, Callable[..., Result]] = {
+    "place_points": check_place_points,
+    "hk_stream": check_hk_stream,
+    "output_formats": check_output_formats,
+}
+
+
+def run_checks(names: Optional[Sequence[str]] = None, rows: int = 3_000) -> bool:
+    """Run the named checks (default: all), print one line per case; True if all pass."""
+    names = list(CHECKS) if names is None else list(names)
+    unknown = sorted(set(names) - set(CHECKS))
+    if unknown:
+        raise ValueError(f"unknown checks {unknown}; expected some of {tuple(CHECKS)}")
+    ok = True
+    for name in names:
+        fn = CHECKS[name]
+        results = fn(rows=rows) if "rows" in inspect.signature(fn).parameters else fn()
+        for case, problems in results:
+            ok &= not problems
+            print(f"{'ok  ' if not problems else 'FAIL'} {name}: {case}")
+            for p in problems:
+                print(f"       {p}")
+    return ok
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Parity checks for the wifiProto pipeline paths")
+    ap.add_argument("--only", default=None, help=f"comma-separated subset of {','.join(CHECKS)}")
+    ap.add_argument("--rows", type=int, default=3_000, help="synthetic records for the placement checks")
+    args = ap.parse_args(argv)
+    if not run_checks(args.only.split(",") if args.only else None, rows=args.rows):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# wifiCube.py
+# Pre-aggregated rollup cube over the HK columnar store (see wifiStore.py).
+# Every (time grain x floor level x user-group level) cuboid is materialized per
+# month under the store's derived dir:
+#   <store>/_derived/cube/<schema>/ym=<YYYYMM>/<time>-<floor>-<group>.parquet
+# Hour grain comes from the hourly partitions, day/week/month from the daily
+# ones. Cuboids hold sums plus a row count, so they are additive: a query reads
+# the smallest cuboid that can answer it and only re-sums across months.
+# Re-ingesting a month drops its cube files (wifiStore.invalidate_derived).
+
+import argparse
+from pathlib import Path
+from typing import Optional, Dict, List, Sequence, Tuple, Union
+
+import pandas as pd
+
+from wifiStore import STORE_DIR, derived_path, floor_lookup, list_partitions, load_store
+
+
+# =============================================================================
+# Cube layout
+# =============================================================================
+CUBE_NAME    = "cube"                              # derived_path(store, CUBE_NAME, schema, ym)
+TIME_GRAINS  = ("hour", "day", "week", "month")    # finest -> coarsest
+FLOOR_LEVELS = ("floor", "all")                    # per Floor label / all floors
+GROUP_LEVELS = ("group", "all")                    # per User-Group / all groups
+
+# Measures available per source schema; the hourly files carry no duration/traffic
+MEASURES = {
+    "hourly": ("User-Count", "WiFi-Conn"),
+    "daily":  ("User-Count", "WiFi-Conn", "Duration-Sec",
+               "Traffic-In-Byte", "Traffic-Out-Byte", "Traffic-Both-Byte"),
+}
+COUNT_COL = "rows"     # base rows folded into each cell (sum / rows = mean)
+TOTAL_GROUP = "Total"  # shipped rollup rows; All-Floors is flagged in wifiStore.FLOOR_INFO
+
+
+def time_source(time: str) -> str:
+    """Store schema a time grain is built from."""
+    if time not in TIME_GRAINS:
+        raise ValueError(f"unknown time grain {time!r}; expected one of {TIME_GRAINS}")
+    return "hourly" if time == "hour" else "daily"
+
+
+def cuboid_keys(time: str, floor: str, group: str) -> List[str]:
+    """Key columns of one cuboid. Date holds the start of the hour/day/week/month."""
+    keys = ["Date", "Hour"] if time == "hour" else ["Date"]
+    if floor == "floor":
+        keys.append("Floor")
+    if group == "group":
+        keys.append("User-Group")
+    return keys
+
+
+def cuboid_path(store_dir: Path, time: str, floor: str, group: str, ym: str) -> Path:
+    return derived_path(store_dir, CUBE_NAME, time_source(time), ym) / f"{time}-{floor}-{group}.parquet"
+
+
+# =============================================================================
+# Build: one month of one schema -> all of its cuboids
+# =============================================================================
+def _base_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Detail rows only: the shipped All-Floors / Total rows would double count."""
+    keep = ~floor_lookup(df["Floor"], "is_aggregate") & (df["User-Group"] != TOTAL_GROUP)
+    return df.loc[keep]
+
+
+def _truncate(dates: pd.Series, time: str) -> pd.Series:
+    if time == "week":
+        return dates.dt.to_period("W-SUN").dt.start_time    # Monday-based weeks
+    if time == "month":
+        return dates.dt.to_period("M").dt.start_time
+    return dates
+
+
+def _rollup(df: pd.DataFrame, keys: List[str], measures: Sequence[str]) -> pd.DataFrame:
+    cols = list(measures) + [COUNT_COL]
+    # int32 in the store; summed as int64 so month totals cannot overflow
+    return df.astype({c: "int64" for c in cols}).groupby(keys, observed=True, sort=True)[cols].sum().reset_index()
+
+
+def month_cuboids(df: pd.DataFrame, schema: str) -> Dict[Tuple[str, str, str], pd.DataFrame]:
+    """
+    Every cuboid for one month of `schema` (a store partition). Raw rows are
+    scanned once for the finest grain; everything else is summed from an
+    already-built parent (week and month from day, since weeks straddle months).
+    """
+    measures = MEASURES[schema]
+    base = _base_rows(df).assign(**{COUNT_COL: 1})
+    out: Dict[Tuple[str, str, str], pd.DataFrame] = {}
+    finest_time = None
+    for time in TIME_GRAINS:
+        if time_source(time) != schema:
+            continue
+        src = base if finest_time is None else out[(finest_time, "floor", "group")]
+        src = src.assign(Date=_truncate(src["Date"], time))
+        out[(time, "floor", "group")] = _rollup(src, cuboid_keys(time, "floor", "group"), measures)
+        finest = out[(time, "floor", "group")]
+        out[(time, "all", "group")] = _rollup(finest, cuboid_keys(time, "all", "group"), measures)
+        out[(time, "floor", "all")] = _rollup(finest, cuboid_keys(time, "floor", "all"), measures)
+        out[(time, "all", "all")] = _rollup(out[(time, "floor", "all")],
+                                             cuboid_keys(time, "all", "all"), measures)
+        finest_time = finest_time or time
+    return out
+
+
+def build_cube(start=None,
+               end=None,
+               store_dir: Path = STORE_DIR,
+               force: bool = False) -> List[Path]:
+    """
+    Materialize the cube for every store month in [start, end] that does not
+    have it yet (or all of them with force=True). Returns the files written.
+    """
+    written = []
+    for schema in ("hourly", "daily"):
+        times = [t for t in TIME_GRAINS if time_source(t) == schema]
+        for ym in list_partitions(schema, store_dir, start, end):
+            paths = {(t, f, g): cuboid_path(store_dir, t, f, g, ym)
+                     for t in times for f in FLOOR_LEVELS for g in GROUP_LEVELS}
+            if not force and all(p.exists() for p in paths.values()):
+                continue
+            df = load_store(schema, months=[ym], store_dir=store_dir,
+                            columns=["Date"] + (["Hour"] if schema == "hourly" else [])
+                                    + ["Floor", "User-Group"] + list(MEASURES[schema]))
+            for key, cub in month_cuboids(df, schema).items():
+                p = paths[key]
+                p.parent.mkdir(parents=True, exist_ok=True)
+                tmp = p.with_suffix(".tmp")
+                cub.to_parquet(tmp, index=False)
+                tmp.replace(p)
+                written.append(p)
+    return written
+
+
+# =============================================================================
+# Query: answer a slice from the smallest matching cuboid
+# =============================================================================
+Labels = Optional[Union[str, Sequence[str]]]
+
+
+def pick_cuboid(time: str, by_floor: bool, by_group: bool,
+                floors: Labels = None, groups: Labels = None) -> Tuple[str, str, str]:
+    """Coarsest cuboid that still has the dimensions the query groups or filters on."""
+    time_source(time)
+    floor = "floor" if by_floor or floors is not None else "all"
+    group = "group" if by_group or groups is not None else "all"
+    return time, floor, group
+
+
+def query(measures: Sequence[str] = ("User-Count",),
+          time: str = "day",
+          by_floor: bool = False,
+          by_group: bool = False,
+          floors: Labels = None,
+          groups: Labels = None,
+          start=None,
+          end=None,
+          store_dir: Path = STORE_DIR) -> pd.DataFrame:
+    """
+    Sum of `measures` (plus the `rows` count) per `time` bucket, optionally
+    split by Floor and/or User-Group, restricted to the given floor / group
+    labels and to the months [start, end] (inclusive, whole months).
+    Reads only the cube files of the chosen cuboid; never the raw partitions.
+    """
+    time, floor, group = pick_cuboid(time, by_floor, by_group, floors, groups)
+    schema = time_source(time)
+    measures = list(measures)
+    missing = set(measures) - set(MEASURES[schema])
+    if missing:
+        raise ValueError(f"{sorted(missing)} not available at {time!r} grain "
+                         f"(source {schema!r} has {MEASURES[schema]})")
+
+    keys = cuboid_keys(time, floor, group)
+    filters = []
+    if floors is not None:
+        filters.append(("Floor", "in", [floors] if isinstance(floors, str) else list(floors)))
+    if groups is not None:
+        filters.append(("User-Group", "in", [groups] if isinstance(groups, str) else list(groups)))
+
+    yms = list_partitions(schema, store_dir, start, end)
+    parts = []
+    for ym in yms:
+        p = cuboid_path(store_dir, time, floor, group, ym)
+        if not p.exists():
+            raise FileNotFoundError(f"{p} missing (run `python wifiCube.py build` first?)")
+        parts.append(pd.read_parquet(p, columns=keys + measures + [COUNT_COL], filters=filters or None))
+    if not parts:
+        raise FileNotFoundError(f"no {schema} partitions in {store_dir} for the requested months")
+
+    out = pd.concat(parts, ignore_index=True).astype({c: "int64" for c in measures + [COUNT_COL]})
+    # Weeks straddle month files; re-sum so each bucket is one row
+    out_keys = [k for k in keys if (k != "Floor" or by_floor) and (k != "User-Group" or by_group)]
+    return out.groupby(out_keys, observed=True, sort=True)[measures + [COUNT_COL]].sum().reset_index()
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Rollup cube over the HK columnar store")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="materialize cube files for store months that lack them")
+    b.add_argument("--store", type=Path, default=STORE_DIR)
+    b.add_argument("--start", default=None, help="first month, e.g. 2015-01")
+    b.add_argument("--end", default=None, help="last month, e.g. 2015-12")
+    b.add_argument("--force", action="store_true", help="rebuild existing cube files")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        written = build_cube(args.start, args.end, store_dir=args.store, force=args.force)
+        print(f"Cube build complete -> {args.store}")
+        print(f" - files written: {len(written)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,38 +4,185 @@
 # Adds source + confidence, time-windowing, dedupe, and remaps all timestamps to Jan 2015.
 
 import math
+import json
 import hashlib
+import argparse
 import calendar
+import warnings
+import dataclasses
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Dict, Any, List, Tuple
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Mapping, Sequence, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
+from wifiCache import StageCache, stage_key
+from wifiTrace import NULL_TRACER, Tracer
+from wifiStore import (DATAVERSE_DIR, FLOOR_SUM_DTYPES, REPO_DIR, SCHEMAS, check_rollups, floor_lookup,
+                       list_month_files, merge_floor_daily, stream_floor_daily, stream_rollup_rows)
+
 
 # =============================================================================
-# PATHS (edit if your files are elsewhere)
+# PATHS (defaults; override with a config file or CLI flags, see PipelineConfig)
 # =============================================================================
-ROOT = Path(r"C:\Users\lunes\Documents\Wifi-map")
-
 # Dartmouth references
-DART_APLOC_PATH = ROOT / "APlocations.csv"                   # AP → floor, local x/y
-DART_AGG_PATH   = ROOT / "dartmouth_movement_agg_demo.csv"   # floor/day aggregate
+DART_APLOC_PATH = REPO_DIR / "campus-heatmap-visualization" / "data" / "dartmouth-location-data.csv"
+DART_AGG_PATH   = (REPO_DIR / "campus-heatmap-visualization" / "data"
+                   / "dartmouth-movement-agg-demo.csv")           # floor/day aggregate (synthetic demo)
+
+# Hong Kong reference: monthly <YYYYMM>-wifi-raw.csv files, streamed for HK_START..HK_END
+HK_DATA_DIR     = DATAVERSE_DIR                                  # dir holding the dataverse CSVs
+HK_START        = "2021-01"
+HK_END          = "2021-01"
+
+# Outputs (created by run_pipeline, not at import)
+OUT_DIR         = REPO_DIR / "outputs"
+
+# Output files: "csv" (text, as before), or "parquet"/"feather" (typed, optionally compressed)
+OUTPUT_FORMAT      = "csv"
+OUTPUT_COMPRESSION = None                                    # e.g. "zstd", "snappy", "lz4"
+
+# Stage cache (wifiCache.py): reruns with unchanged inputs/parameters/code load results
+CACHE_DIR_NAME  = "_stage_cache"                             # inside the output dir
+CACHE_MAX_BYTES = 1 << 30                                    # LRU-evicted beyond this
+CACHE_CODE      = (Path(__file__).resolve(),                 # edits here invalidate cached stages
+                   Path(__file__).resolve().with_name("wifiStore.py"))
+
+
+# =============================================================================
+# Output writer
+# =============================================================================
+OUTPUT_SUFFIX = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+
+def write_output(df: pd.DataFrame,
+                 stem: str,
+                 fmt: str = OUTPUT_FORMAT,
+                 compression: Optional[str] = OUTPUT_COMPRESSION,
+                 out_dir: Path = OUT_DIR) -> Path:
+    """
+    Write one pipeline output as out_dir/<stem>.<fmt>. Parquet/Feather keep the
+    dtypes (datetimes, Int64 floors, strings), so readers skip the text parse.
+    compression applies to Parquet/Feather only (None = uncompressed in
+    both); CSV stays plain text.
+    """
+    if fmt not in OUTPUT_SUFFIX:
+        raise ValueError(f"unknown output format {fmt!r}; expected one of {tuple(OUTPUT_SUFFIX)}")
+    path = Path(out_dir) / (stem + OUTPUT_SUFFIX[fmt])
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False, compression=compression)
+    else:
+        # Feather stores no index; the row order is all the outputs rely on.
+        # pyarrow reads compression=None as "its default" (lz4), so spell it out
+        df.reset_index(drop=True).to_feather(path, compression=compression or "uncompressed")
+    return path
+
+
+# =============================================================================
+# Stage parameters (part of every stage cache key)
+# =============================================================================
+DART_BBOX       = (43.7000, 43.7050, -72.2950, -72.2850)     # synthetic AP lat/lon box
+REMAP_YEAR      = 2015                                       # every timestamp moved into this month
+REMAP_MONTH     = 1
+DEDUPE_WINDOW   = "1D"                                       # window_and_dedupe bucket
 
-# Hong Kong reference (Jan 2021)
-HK_RAW_PATH     = ROOT / "202101-wifi-raw.csv"
 
-# Outputs
-OUT_DIR         = ROOT / "outputs"
-OUT_DIR.mkdir(parents=True, exist_ok=True)
+# =============================================================================
+# Run configuration
+# =============================================================================
+@dataclass(frozen=True)
+class PipelineConfig:
+    """
+    Everything one run_pipeline call needs: input/output paths, the HK month
+    range, workers, output format and the stage parameters. Build it directly,
+    from a TOML/JSON file (load_config), or from CLI flags (main).
+    """
+    dart_aploc: Path = DART_APLOC_PATH
+    dart_agg: Path = DART_AGG_PATH
+    hk_data_dir: Path = HK_DATA_DIR
+    hk_start: str = HK_START
+    hk_end: str = HK_END
+    out_dir: Path = OUT_DIR
+    out_format: str = OUTPUT_FORMAT
+    compression: Optional[str] = OUTPUT_COMPRESSION
+    jobs: int = 1
+    hk_totals: str = "detail"          # "detail" | "rollup" (see run_pipeline)
+    validate: bool = False
+    use_cache: bool = True
+    cache_dir: Optional[Path] = None   # None -> out_dir / CACHE_DIR_NAME
+    cache_max_bytes: int = CACHE_MAX_BYTES
+    bbox: Tuple[float, float, float, float] = DART_BBOX
+    remap_year: int = REMAP_YEAR
+    remap_month: int = REMAP_MONTH
+    dedupe_window: str = DEDUPE_WINDOW
+
+    def __post_init__(self):
+        for name in ("dart_aploc", "dart_agg", "hk_data_dir", "out_dir", "cache_dir"):
+            value = getattr(self, name)
+            if value is not None and not isinstance(value, Path):
+                object.__setattr__(self, name, Path(value))
+        object.__setattr__(self, "bbox", tuple(self.bbox))
+        if self.out_format not in OUTPUT_SUFFIX:
+            raise ValueError(f"out_format must be one of {tuple(OUTPUT_SUFFIX)}, got {self.out_format!r}")
+        if self.hk_totals not in ("detail", "rollup"):
+            raise ValueError(f"hk_totals must be 'detail' or 'rollup', got {self.hk_totals!r}")
+        if self.jobs < 1:
+            raise ValueError(f"jobs must be >= 1, got {self.jobs}")
+
+    @property
+    def stage_cache_dir(self) -> Path:
+        return self.cache_dir if self.cache_dir is not None else self.out_dir / CACHE_DIR_NAME
+
+    def replace(self, **changes: Any) -> "PipelineConfig":
+        """Copy with some fields changed; None is a value too (e.g. compression=None)."""
+        return dataclasses.replace(self, **changes)
+
+    def check_inputs(self) -> None:
+        """FileNotFoundError naming the config key of the first input path that does not exist."""
+        for key in ("dart_aploc", "dart_agg", "hk_data_dir"):
+            path = getattr(self, key)
+            if not path.exists():
+                raise FileNotFoundError(f"{key} = {path} does not exist; set {key} in the config file "
+                                        f"or pass --{key.replace('_', '-')}")
+
+
+def load_config(path: Optional[Path] = None, **overrides: Any) -> PipelineConfig:
+    """
+    PipelineConfig from a .toml or .json file of field = value pairs, then
+    overrides, applied as given (compression=None turns compression off).
+    Relative paths in the file are resolved against the file's directory,
+    so a config can travel with its data.
+    """
+    values: Dict[str, Any] = {}
+    if path is not None:
+        path = Path(path)
+        if path.suffix == ".toml":
+            import tomllib
+            values = tomllib.loads(path.read_text())
+        else:
+            values = json.loads(path.read_text())
+        known = {f.name for f in dataclasses.fields(PipelineConfig)}
+        unknown = sorted(set(values) - known)
+        if unknown:
+            raise ValueError(f"{path}: unknown config keys {unknown}; expected some of {sorted(known)}")
+        for name in ("dart_aploc", "dart_agg", "hk_data_dir", "out_dir", "cache_dir"):
+            if values.get(name) is not None:
+                values[name] = (path.parent / Path(values[name]).expanduser()).resolve()
+    return PipelineConfig(**values).replace(**overrides)
 
 
 # =============================================================================
 # Synthetic coordinates (deterministic placement inside a bbox)
 # =============================================================================
 def _hash_u01(key: str) -> float:
-    h = hashlib.sha256(key.encode("utf-8")).hexdigest()
-    return (int(h[:8], 16) % 10_000_000) / 10_000_000.0
+    # First 4 digest bytes == int(hexdigest()[:8], 16), without the hex round trip
+    h = hashlib.sha256(key.encode("utf-8")).digest()
+    return (int.from_bytes(h[:4], "big") % 10_000_000) / 10_000_000.0
 
 def synthetic_point(label: str,
                     bbox: Tuple[float, float, float, float],
@@ -57,6 +204,35 @@ def synthetic_point(label: str,
         lon += fv * floor_jitter_deg
     return lat, lon
 
+def synthetic_points(labels: Sequence[str],
+                     floors: Optional[Sequence[Optional[int]]],
+                     bbox: Tuple[float, float, float, float],
+                     floor_jitter_deg: float = 0.0003) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Batch synthetic_point: returns (lat, lon) arrays bit-identical to calling
+    synthetic_point(label, bbox, floor) per element. Each unique label (and
+    unique label/floor pair) is hashed once. floors entries that are None/NaN
+    (or floors=None) get no floor jitter.
+    """
+    lat_min, lat_max, lon_min, lon_max = bbox
+    codes, uniq = pd.factorize(pd.Series(labels, dtype=object).astype(str), sort=False)
+    u = np.array([_hash_u01(lab + "::lat") for lab in uniq], dtype=float)
+    v = np.array([_hash_u01(lab + "::lon") for lab in uniq], dtype=float)
+    lat = lat_min + u[codes] * (lat_max - lat_min)
+    lon = lon_min + v[codes] * (lon_max - lon_min)
+    if floors is None:
+        return lat, lon
+
+    fl = pd.to_numeric(pd.Series(floors, dtype=object), errors="coerce").to_numpy(dtype=float)
+    has = ~np.isnan(fl)
+    pairs = pd.MultiIndex.from_arrays([codes[has], fl[has].astype(np.int64)])
+    pcodes, puniq = pd.factorize(pairs)
+    fu = np.array([_hash_u01(f"{uniq[c]}::floor::{f}::u") - 0.5 for c, f in puniq], dtype=float)
+    fv = np.array([_hash_u01(f"{uniq[c]}::floor::{f}::v") - 0.5 for c, f in puniq], dtype=float)
+    lat[has] += fu[pcodes] * floor_jitter_deg
+    lon[has] += fv[pcodes] * floor_jitter_deg
+    return lat, lon
+
 
 # =============================================================================
 # RSSI utilities (used automatically if your data later includes signals)
@@ -69,25 +245,69 @@ def rssi_to_weight(rssi_dbm: float, floor_penalty_db: float = 0.0) -> float:
     k = 12.0
     return math.exp((rssi + 90.0) / k)
 
+@dataclass(frozen=True)
+class APIndex:
+    """
+    Immutable, array-backed view of an AP lookup table.
+    slots maps AP name -> row in the read-only lat/lon/floor arrays.
+    Build once per lookup with APIndex.from_lookup and reuse for every record.
+    """
+    slots: Mapping[Any, int]
+    lat: np.ndarray
+    lon: np.ndarray
+    floor: np.ndarray
+
+    @classmethod
+    def from_lookup(cls, ap_lookup: pd.DataFrame) -> "APIndex":
+        """ap_lookup columns: ["AP","lat","lon","Floor"] (build_dartmouth_ap_lookup output)."""
+        names = ap_lookup["AP"].tolist()
+        slots = {name: i for i, name in enumerate(names)}  # duplicate names: last row wins
+        cols = []
+        for c in ("lat", "lon", "Floor"):
+            arr = pd.to_numeric(ap_lookup[c], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            arr.setflags(write=False)
+            cols.append(arr)
+        return cls(MappingProxyType(slots), *cols)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.slots) == 0
+
+
+def as_ap_index(ap_lookup: Union[pd.DataFrame, APIndex, None]) -> Optional[APIndex]:
+    """Accept either an APIndex or a raw lookup DataFrame; None/empty -> None."""
+    if ap_lookup is None:
+        return None
+    if not isinstance(ap_lookup, APIndex):
+        ap_lookup = APIndex.from_lookup(ap_lookup)
+    return None if ap_lookup.empty else ap_lookup
+
+
 def estimate_from_rssi(signals: List[Dict[str, Any]],
-                       ap_lookup: pd.DataFrame,
+                       ap_lookup: Union[pd.DataFrame, APIndex, None],
                        target_floor: Optional[int] = None) -> Optional[Dict[str, float]]:
     """
     Weighted centroid from AP coordinates using RSSI.
     signals: [{"ap": "AP_NAME", "rssi": -55}, ...]
-    ap_lookup columns: ["AP","lat","lon","Floor"]
+    ap_lookup: APIndex, or a DataFrame with columns ["AP","lat","lon","Floor"]
+    (a DataFrame is indexed on every call; pass an APIndex when placing many records).
     """
-    if not signals or ap_lookup is None or ap_lookup.empty:
+    if not signals:
+        return None
+    index = as_ap_index(ap_lookup)
+    if index is None:
         return None
-    ap_map = ap_lookup.set_index("AP")[["lat", "lon", "Floor"]].to_dict(orient="index")
     w_sum = lat_sum = lon_sum = 0.0
     used = 0
     for s in signals:
-        apid = s.get("ap"); rssi = s.get("rssi")
-        if apid not in ap_map or rssi is None:
+        slot = index.slots.get(s.get("ap")); rssi = s.get("rssi")
+        if slot is None or rssi is None:
             continue
-        lat = ap_map[apid]["lat"]; lon = ap_map[apid]["lon"]; ap_fl = ap_map[apid]["Floor"]
-        if pd.isna(lat) or pd.isna(lon):
+        lat = index.lat[slot]; lon = index.lon[slot]; ap_fl = index.floor[slot]
+        if np.isnan(lat) or np.isnan(lon):
             continue
         penalty = 8.0 if (target_floor is not None and ap_fl != target_floor) else 0.0
         w = rssi_to_weight(rssi, penalty)
@@ -97,14 +317,75 @@ def estimate_from_rssi(signals: List[Dict[str, Any]],
     return {"lat": lat_sum / w_sum, "lon": lon_sum / w_sum}
 
 
+def rssi_to_weights(rssi_dbm: np.ndarray, floor_penalty_db: Any = 0.0) -> np.ndarray:
+    """Array form of rssi_to_weight; NaN RSSI -> weight 0. Penalty may be scalar or per-signal."""
+    rssi = np.asarray(rssi_dbm, dtype=float)
+    w = np.exp((np.clip(rssi, -90.0, -30.0) - floor_penalty_db + 90.0) / 12.0)
+    return np.where(np.isnan(rssi), 0.0, w)
+
+def flatten_signals(signals: Sequence[Optional[List[Dict[str, Any]]]],
+                    ap_index: APIndex) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Ragged per-record signal lists -> flat (offsets, slots, rssi) arrays.
+    Record i owns entries offsets[i]:offsets[i+1]; unknown APs and missing RSSI get slot -1.
+    """
+    counts = np.zeros(len(signals), dtype=np.int64)
+    slots: List[int] = []
+    rssi: List[float] = []
+    get_slot = ap_index.slots.get
+    for i, sigs in enumerate(signals):
+        if not isinstance(sigs, (list, tuple)):
+            continue
+        counts[i] = len(sigs)
+        for s in sigs:
+            r = s.get("rssi")
+            slots.append(-1 if r is None else get_slot(s.get("ap"), -1))
+            rssi.append(np.nan if r is None else r)
+    offsets = np.zeros(len(signals) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, np.asarray(slots, dtype=np.int64), np.asarray(rssi, dtype=float)
+
+def estimate_from_rssi_batch(offsets: np.ndarray,
+                             slots: np.ndarray,
+                             rssi: np.ndarray,
+                             ap_index: APIndex,
+                             target_floors: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    estimate_from_rssi for many records in one NumPy pass over flat signal arrays
+    (see flatten_signals). target_floors: one floor per record, NaN = unknown.
+    Returns (lat, lon) arrays; NaN where a record has no usable signal.
+    """
+    n = len(offsets) - 1
+    rec = np.repeat(np.arange(n), np.diff(offsets))
+    slots = np.asarray(slots, dtype=np.int64)
+    safe = np.where(slots >= 0, slots, 0)
+    ap_lat = ap_index.lat[safe]; ap_lon = ap_index.lon[safe]
+    usable = (slots >= 0) & ~np.isnan(ap_lat) & ~np.isnan(ap_lon)
+
+    # Floor-mismatch penalty (8 dB), only where the record's floor is known
+    penalty = 0.0
+    if target_floors is not None:
+        tf = np.asarray(target_floors, dtype=float)[rec]
+        penalty = np.where(~np.isnan(tf) & (ap_index.floor[safe] != tf), 8.0, 0.0)
+    w = np.where(usable, rssi_to_weights(rssi, penalty), 0.0)
+
+    w_sum = np.bincount(rec, weights=w, minlength=n)
+    lat_sum = np.bincount(rec, weights=w * np.where(usable, ap_lat, 0.0), minlength=n)
+    lon_sum = np.bincount(rec, weights=w * np.where(usable, ap_lon, 0.0), minlength=n)
+    ok = w_sum > 0
+    denom = np.where(ok, w_sum, 1.0)
+    return np.where(ok, lat_sum / denom, np.nan), np.where(ok, lon_sum / denom, np.nan)
+
+
 # =============================================================================
 # Placement: GPS -> RSSI+floor -> floor-only -> unplaced
 # =============================================================================
 def place_point(row: pd.Series,
-                ap_lookup: Optional[pd.DataFrame],
+                ap_lookup: Union[pd.DataFrame, APIndex, None],
                 floor_centroids: Optional[pd.DataFrame]) -> Dict[str, Any]:
     """
     Returns {"lat","lon","floor","source","confidence"} for a record.
+    ap_lookup may be an APIndex (preferred) or the raw lookup DataFrame.
     """
     # 1) Exact GPS
     if "lat" in row and "lon" in row and pd.notna(row["lat"]) and pd.notna(row["lon"]):
@@ -118,7 +399,7 @@ def place_point(row: pd.Series,
 
     # 2) RSSI + floor
     signals = row.get("signals", None)
-    if signals is not None and ap_lookup is not None and not ap_lookup.empty:
+    if signals is not None and ap_lookup is not None and len(ap_lookup) > 0:
         est = estimate_from_rssi(signals, ap_lookup, target_floor=fl)
         if est is not None:
             return dict(lat=est["lat"], lon=est["lon"], floor=fl, source="rssi", confidence=0.7)
@@ -136,11 +417,85 @@ def place_point(row: pd.Series,
     return dict(lat=np.nan, lon=np.nan, floor=fl, source="unplaced", confidence=0.0)
 
 
+def _floor_jitter(ids: pd.Series, floors: pd.Series) -> np.ndarray:
+    """Same tiny de-overlap jitter as place_point, hashed once per unique (id, floor)."""
+    keys = pd.MultiIndex.from_arrays([ids, floors])
+    codes, uniques = pd.factorize(keys)
+    table = np.array([(hash((i, int(f))) % 1000) / 1e8 for i, f in uniques], dtype=float)
+    return table[codes]
+
+
+def place_points(df: pd.DataFrame,
+                 ap_lookup: Union[pd.DataFrame, APIndex, None],
+                 floor_centroids: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Columnar place_point: resolves GPS -> RSSI+floor -> floor-only -> unplaced
+    for every row at once. Returns ["lat","lon","floor","source","confidence"]
+    aligned to df.index, with the same values place_point gives row by row.
+    """
+    n = len(df)
+    lat = np.full(n, np.nan)
+    lon = np.full(n, np.nan)
+    source = np.full(n, "unplaced", dtype=object)
+    confidence = np.zeros(n)
+
+    floor_col = "Floor" if "Floor" in df.columns else ("floor" if "floor" in df.columns else None)
+    raw_floor = df[floor_col] if floor_col else pd.Series(np.nan, index=df.index)
+    num_floor = pd.to_numeric(raw_floor, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    has_floor = ~np.isnan(num_floor)
+    floor = np.where(has_floor, np.trunc(num_floor), np.nan)  # int(floor_val)
+
+    # 1) Exact GPS
+    gps = np.zeros(n, dtype=bool)
+    if "lat" in df.columns and "lon" in df.columns:
+        gps = (df["lat"].notna() & df["lon"].notna()).to_numpy()
+        lat[gps] = df["lat"].to_numpy(dtype=float)[gps]
+        lon[gps] = df["lon"].to_numpy(dtype=float)[gps]
+        source[gps] = "gps"; confidence[gps] = 1.0
+    todo = ~gps
+
+    # 2) RSSI + floor
+    ap_index = as_ap_index(ap_lookup)
+    if "signals" in df.columns and ap_index is not None:
+        rows = np.flatnonzero(todo & df["signals"].notna().to_numpy())
+        offsets, slots, rssi = flatten_signals(df["signals"].to_numpy()[rows], ap_index)
+        est_lat, est_lon = estimate_from_rssi_batch(offsets, slots, rssi, ap_index, floor[rows])
+        hit = ~np.isnan(est_lat)
+        rows = rows[hit]
+        lat[rows] = est_lat[hit]; lon[rows] = est_lon[hit]
+        source[rows] = "rssi"; confidence[rows] = 0.7
+        todo[rows] = False
+
+    # 3) Floor-only (use centroids)
+    if floor_centroids is not None and not floor_centroids.empty:
+        first = floor_centroids.drop_duplicates("Floor", keep="first").set_index("Floor")
+        cand = todo & has_floor
+        base_lat = pd.Series(floor[cand]).map(first["lat"].astype(float)).to_numpy(dtype=float)
+        base_lon = pd.Series(floor[cand]).map(first["lon"].astype(float)).to_numpy(dtype=float)
+        hit = ~np.isnan(base_lat)
+        rows = np.flatnonzero(cand)[hit]
+        if len(rows):
+            ids = df["id"].iloc[rows] if "id" in df.columns else pd.Series(0, index=rows)
+            jitter = _floor_jitter(ids.reset_index(drop=True), pd.Series(floor[rows]))
+            lat[rows] = base_lat[hit] + jitter
+            lon[rows] = base_lon[hit] - jitter
+            source[rows] = "floor_only"; confidence[rows] = 0.3
+
+    # GPS rows keep their own floor value; everything else gets int(floor)
+    floor_out = np.where(gps, num_floor, floor)
+    finite = floor_out[~np.isnan(floor_out)]
+    if np.array_equal(finite, np.trunc(finite)):
+        floor_out = pd.array(floor_out, dtype="Int64")
+
+    return pd.DataFrame({"lat": lat, "lon": lon, "floor": floor_out,
+                         "source": source, "confidence": confidence}, index=df.index)
+
+
 # =============================================================================
 # Dartmouth: build AP lookup + floor centroids (synthetic lat/lon for now)
 # =============================================================================
 def build_dartmouth_ap_lookup(aplocations_csv: Path,
-                              bbox_main: Tuple[float, float, float, float] = (43.7000, 43.7050, -72.2950, -72.2850)
+                              bbox_main: Tuple[float, float, float, float] = DART_BBOX
                               ) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Returns:
@@ -148,22 +503,12 @@ def build_dartmouth_ap_lookup(aplocations_csv: Path,
       floor_centroids: [Floor, lat, lon]
     Uses synthetic WGS84 positions within a bbox (deterministic) for prototyping.
     """
-    ap = pd.read_csv(aplocations_csv).rename(columns={
-        '#AP': 'AP',
-        ' x coordinate (-1 = unknown)': 'x',
-        ' y coordinate (-1 = unknown)': 'y',
-        ' z coordinate (floor': 'floor_raw',
-        ' 99 = unknown)': 'junk'
-    })
+    ap = SCHEMAS["dartmouth_ap"].read_csv(aplocations_csv)   # AP, x, y, floor_raw
     ap["Floor"] = pd.to_numeric(ap["floor_raw"], errors="coerce").astype("Int64")
     ap = ap.dropna(subset=["Floor"]).copy()
     ap["Floor"] = ap["Floor"].astype(int)
 
-    lat_list, lon_list = [], []
-    for _, r in ap.iterrows():
-        lat, lon = synthetic_point(str(r["AP"]), bbox_main, floor=int(r["Floor"]))
-        lat_list.append(lat); lon_list.append(lon)
-    ap["lat"] = lat_list; ap["lon"] = lon_list
+    ap["lat"], ap["lon"] = synthetic_points(ap["AP"].astype(str), ap["Floor"], bbox_main)
 
     floor_centroids = (ap.groupby("Floor", as_index=False)[["lat", "lon"]]
                          .mean()
@@ -177,14 +522,41 @@ def build_dartmouth_ap_lookup(aplocations_csv: Path,
 def window_and_dedupe(df: pd.DataFrame,
                       ts_col: str = "timestamp",
                       device_col: str = "device_id",
-                      window: str = "5T") -> pd.DataFrame:
+                      window: str = "5min",
+                      method: str = "hash") -> pd.DataFrame:
     """
     Bucket into time windows and keep highest-confidence row per device per window.
+    Output is ordered by (device, window); ties keep the earliest row.
+    method="hash" (default) picks the per-group max in O(n) from hashed group
+    codes without copying df; method="sort" is the original full sort + drop_duplicates.
     """
-    out = df.copy()
-    out["time_window"] = pd.to_datetime(out[ts_col]).dt.floor(window)
-    out = out.sort_values([device_col, "time_window", "confidence"], ascending=[True, True, False])
-    out = out.drop_duplicates([device_col, "time_window"], keep="first")
+    time_window = pd.to_datetime(df[ts_col]).dt.floor(window)
+    if method == "sort":
+        out = df.copy()
+        out["time_window"] = time_window
+        out = out.sort_values([device_col, "time_window", "confidence"], ascending=[True, True, False])
+        return out.drop_duplicates([device_col, "time_window"], keep="first")
+    if method != "hash":
+        raise ValueError(f"unknown dedupe method: {method!r}")
+
+    # Sorted codes per key (only the uniques get sorted), combined into one group id
+    dev_codes, dev_uniq = pd.factorize(df[device_col], sort=True, use_na_sentinel=False)
+    win_codes, win_uniq = pd.factorize(time_window, sort=True, use_na_sentinel=False)
+    key = dev_codes.astype(np.int64) * len(win_uniq) + win_codes
+    gid, gkeys = pd.factorize(key)
+
+    # Max confidence per group (NaN loses to any value), then the first row reaching it
+    conf = pd.to_numeric(df["confidence"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    conf = np.where(np.isnan(conf), -np.inf, conf)
+    best = np.full(len(gkeys), -np.inf)
+    np.maximum.at(best, gid, conf)
+    top = np.flatnonzero(conf == best[gid])
+    first = np.full(len(gkeys), len(df), dtype=np.int64)
+    np.minimum.at(first, gid[top], top)
+
+    rows = first[np.argsort(gkeys, kind="stable")]
+    out = df.take(rows)
+    out["time_window"] = time_window.to_numpy()[rows]
     return out
 
 
@@ -192,37 +564,52 @@ def window_and_dedupe(df: pd.DataFrame,
 # Remap timestamps to a fixed month/year (Jan 2015 for both campuses)
 # =============================================================================
 def remap_to_month_year(df: pd.DataFrame, ts_col: str, year: int, month: int) -> pd.DataFrame:
-    """Copy with timestamps remapped to given year/month, keeping day/time if possible."""
+    """
+    Copy with timestamps remapped to given year/month, keeping day/time if possible.
+    Days past the target month's end are clipped to its last day. Works on whole
+    columns (any mix of source years/months); tz-aware input keeps its wall time.
+    """
     df = df.copy()
     _, last_day = calendar.monthrange(year, month)
     ts = pd.to_datetime(df[ts_col])
-
-    def _remap_one(t):
-        day = min(t.day, last_day)
-        return pd.Timestamp(year, month, day, t.hour, t.minute, t.second, t.microsecond)
-
-    df[ts_col] = ts.apply(_remap_one)
+    if ts.dt.tz is not None:
+        ts = ts.dt.tz_localize(None)
+
+    day = np.minimum(ts.dt.day.to_numpy(dtype=float, na_value=np.nan), last_day)
+    time_of_day = ts - ts.dt.normalize()
+    df[ts_col] = (pd.Timestamp(year, month, 1)
+                  + pd.to_timedelta(day - 1, unit="D")
+                  + time_of_day.to_numpy())
     return df
 
 
 # =============================================================================
 # Pipeline
 # =============================================================================
-def run_pipeline():
-    # ---------- Dartmouth: AP lookup (synthetic lat/lon) + floor centroids
-    ap_lookup, floor_centroids = build_dartmouth_ap_lookup(DART_APLOC_PATH)
-
-    # ---------- Dartmouth aggregate -> records
-    dart = pd.read_csv(DART_AGG_PATH, parse_dates=["Date"])
+def _dartmouth_stage(agg_path: Path,
+                     ap_lookup: pd.DataFrame,
+                     floor_centroids: pd.DataFrame,
+                     remap: Tuple[int, int] = (REMAP_YEAR, REMAP_MONTH),
+                     window: str = DEDUPE_WINDOW,
+                     tracer: Tracer = NULL_TRACER) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Dartmouth aggregate -> records -> placed (raw, windowed/deduped). Runs in a worker with --jobs."""
+    ap_index = APIndex.from_lookup(ap_lookup)
+
+    with tracer.stage("dartmouth.load") as st:
+        dart = SCHEMAS["dartmouth_agg"].read_csv(agg_path)
+        st.rows_out = len(dart)
     dart["Floor"] = pd.to_numeric(dart["Floor"], errors="coerce")
     dart = dart.dropna(subset=["Floor"]).copy()
     dart["Floor"] = dart["Floor"].astype(int)
 
+    # int32 on read, int64 in the records like the HK sums (campus totals add them up)
     dart_records = (dart.rename(columns={"Date": "timestamp"})
                     [["timestamp", "Floor", "User-Count", "WiFi-Conn", "Duration-Sec"]]
-                    .copy())
+                    .astype(FLOOR_SUM_DTYPES))
 
-    dart_records = remap_to_month_year(dart_records, "timestamp", 2015, 1)
+    with tracer.stage("dartmouth.remap", rows_in=len(dart_records)) as st:
+        dart_records = remap_to_month_year(dart_records, "timestamp", *remap)
+        st.rows_out = len(dart_records)
 
     dart_records["device_id"] = (
         "dart_f" + dart_records["Floor"].astype("Int64").astype("string") + "_" +
@@ -230,20 +617,29 @@ def run_pipeline():
     )
 
     # Place -> window/dedupe
-    placed_dart = dart_records.apply(lambda r: place_point(r, ap_lookup, floor_centroids),
-                                     axis=1).apply(pd.Series)
-    dart_out = pd.concat([dart_records, placed_dart], axis=1)
-    dart_clean = window_and_dedupe(dart_out, ts_col="timestamp", device_col="device_id", window="1D")
-
-    # ---------- Hong Kong aggregate -> records
-    # -------- Hong Kong aggregate
-    hk = pd.read_csv(HK_RAW_PATH, parse_dates=["Date"])
-    hk_agg = (hk.groupby(["Date", "Floor"], dropna=False)   # allow rows even if Floor is NaN
-                .agg({"User-Count":"sum", "WiFi-Conn":"sum", "Duration-Sec":"sum"})
-                .reset_index())
-
-    # Force numeric; keep NaN if not numeric
-    hk_agg["Floor"] = pd.to_numeric(hk_agg["Floor"], errors="coerce")
+    with tracer.stage("dartmouth.place", rows_in=len(dart_records)) as st:
+        placed_dart = place_points(dart_records, ap_index, floor_centroids)
+        dart_out = pd.concat([dart_records, placed_dart], axis=1)
+        st.rows_out = len(dart_out)
+    with tracer.stage("dartmouth.dedupe", rows_in=len(dart_out)) as st:
+        dart_clean = window_and_dedupe(dart_out, ts_col="timestamp", device_col="device_id", window=window)
+        st.rows_out = len(dart_clean)
+    return dart_out, dart_clean
+
+
+def _hk_stage(hk_agg: pd.DataFrame,
+              floor_centroids: pd.DataFrame,
+              remap: Tuple[int, int] = (REMAP_YEAR, REMAP_MONTH),
+              window: str = DEDUPE_WINDOW,
+              tracer: Tracer = NULL_TRACER) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """HK Date/Floor aggregate -> records -> placed (raw, windowed/deduped)."""
+    # Own copy first, so the caller's aggregate is never modified
+    hk_agg = hk_agg.copy()
+
+    # Floor labels (G, 1, LG1, ...) -> building ordinal via the shared floor table;
+    # All-Floors rollup rows are dropped by code, not string compare
+    hk_agg = hk_agg.loc[~floor_lookup(hk_agg["Floor"], "is_aggregate")].copy()
+    hk_agg["Floor"] = floor_lookup(hk_agg["Floor"], "ordinal")
 
     # Drop rows with unknown floor (or choose to impute them)
     hk_agg = hk_agg.dropna(subset=["Floor"]).copy()
@@ -256,7 +652,9 @@ def run_pipeline():
                         .copy())
 
     # Remap to Jan 2015
-    hk_records = remap_to_month_year(hk_records, "timestamp", 2015, 1)
+    with tracer.stage("hk.remap", rows_in=len(hk_records)) as st:
+        hk_records = remap_to_month_year(hk_records, "timestamp", *remap)
+        st.rows_out = len(hk_records)
 
     # Create device_id without risking NaN
     hk_records["device_id"] = (
@@ -264,40 +662,191 @@ def run_pipeline():
         hk_records["timestamp"].dt.date.astype("string")
     )
 
-
     # Place -> window/dedupe (HK has no APs/GPS; uses floor-only centroids from Dartmouth)
-    placed_hk = hk_records.apply(lambda r: place_point(r, ap_lookup=None, floor_centroids=floor_centroids),
-                                 axis=1).apply(pd.Series)
-    hk_out = pd.concat([hk_records, placed_hk], axis=1)
-    hk_clean = window_and_dedupe(hk_out, ts_col="timestamp", device_col="device_id", window="1D")
+    with tracer.stage("hk.place", rows_in=len(hk_records)) as st:
+        placed_hk = place_points(hk_records, ap_lookup=None, floor_centroids=floor_centroids)
+        hk_out = pd.concat([hk_records, placed_hk], axis=1)
+        st.rows_out = len(hk_out)
+    with tracer.stage("hk.dedupe", rows_in=len(hk_out)) as st:
+        hk_clean = window_and_dedupe(hk_out, ts_col="timestamp", device_col="device_id", window=window)
+        st.rows_out = len(hk_clean)
+    return hk_out, hk_clean
+
+
+def run_pipeline(config: Optional[PipelineConfig] = None,
+                 tracer: Tracer = NULL_TRACER,
+                 **overrides: Any) -> List[Path]:
+    """
+    Run the whole pipeline for `config` (PipelineConfig defaults when None;
+    keyword overrides replace single fields, e.g. run_pipeline(jobs=4)).
+    Returns the output files written.
+
+    jobs > 1 fans the Dartmouth half and each HK month out to a process pool.
+    Results are collected in submission (month) order, so outputs are
+    byte-identical to the serial run.
+    hk_totals="rollup" takes the HK campus totals from the shipped
+    All-Floors/Total rows instead of summing the placed detail rows. For a
+    one-month range both give the same WiFi-Conn and Duration-Sec; User-Count
+    is a distinct count per floor, so the detail sum counts a user once per
+    floor visited and exceeds the rollup (check_rollups treats that as
+    expected). Over longer ranges the remap folds the months onto one and the
+    dedupe keeps one row per floor and day, so only "rollup" covers them all.
+    validate=True checks the HK detail rows against those rollup rows first.
+    use_cache=False recomputes every stage instead of reading the stage cache.
+    out_format/compression pick the output files (see write_output).
+    tracer (a wifiTrace.Tracer) records time/CPU/rows/peak RSS per stage; with
+    jobs > 1 the pooled work shows up as one "pool" stage.
+    """
+    cfg = (config or PipelineConfig()).replace(**overrides)
+    cfg.check_inputs()
+    cfg.out_dir.mkdir(parents=True, exist_ok=True)
+    if cfg.validate:
+        with tracer.stage("validate"):
+            report = check_rollups("daily", cfg.hk_start, cfg.hk_end, src_dir=cfg.hk_data_dir)
+        bad = report[report["mismatches"] > 0]
+        if len(bad):
+            warnings.warn("HK detail rows disagree with the shipped rollup rows:\n"
+                          + bad.to_string(index=False))
+
+    # ---------- Stage cache: key = input fingerprints + parameters + pipeline source
+    cache = StageCache(cfg.stage_cache_dir if cfg.use_cache else None, cfg.cache_max_bytes)
+    stage_args = dict(remap=(cfg.remap_year, cfg.remap_month), window=cfg.dedupe_window)
+    hk_files = list_month_files("daily", cfg.hk_start, cfg.hk_end, src_dir=cfg.hk_data_dir)
+    dart_key = stage_key("dartmouth", [cfg.dart_aploc, cfg.dart_agg], CACHE_CODE,
+                         bbox=cfg.bbox, **stage_args)
+    hk_key = stage_key("hk", [cfg.dart_aploc] + [f.path for f in hk_files], CACHE_CODE,
+                       bbox=cfg.bbox, **stage_args)
+    with tracer.stage("cache.lookup") as st:
+        dart = cache.get(dart_key)
+        hk = cache.get(hk_key)
+        st.note = f"dartmouth {'hit' if dart is not None else 'miss'}, hk {'hit' if hk is not None else 'miss'}"
+
+    if hk is None and not hk_files:
+        # Same error on both paths (the pool path would otherwise fail merging zero months)
+        raise FileNotFoundError(f"no daily HK files in {cfg.hk_data_dir} between {cfg.hk_start} and {cfg.hk_end}")
+
+    if dart is None or hk is None:
+        # ---------- Dartmouth: AP lookup (synthetic lat/lon) + floor centroids
+        with tracer.stage("ap_lookup.load") as st:
+            ap_lookup, floor_centroids = cache.cached(
+                stage_key("ap_lookup", [cfg.dart_aploc], CACHE_CODE, bbox=cfg.bbox),
+                lambda: build_dartmouth_ap_lookup(cfg.dart_aploc, cfg.bbox))
+            st.rows_out = len(ap_lookup)
+
+        hk_agg = None
+        if cfg.jobs > 1:
+            with tracer.stage("pool") as st, ProcessPoolExecutor(max_workers=cfg.jobs) as pool:
+                st.note = f"{cfg.jobs} workers"
+                if dart is None:
+                    dart_fut = pool.submit(_dartmouth_stage, cfg.dart_agg, ap_lookup, floor_centroids,
+                                           **stage_args)
+                if hk is None:
+                    # ---------- Hong Kong: one Date/Floor partial aggregate per month
+                    hk_futs = [pool.submit(stream_floor_daily, f.ym, f.ym, src_dir=cfg.hk_data_dir)
+                               for f in hk_files]
+                    hk_agg = merge_floor_daily([f.result() for f in hk_futs])
+                if dart is None:
+                    dart = dart_fut.result()
+                    cache.put(dart_key, dart)
+        else:
+            if dart is None:
+                dart = _dartmouth_stage(cfg.dart_agg, ap_lookup, floor_centroids, **stage_args,
+                                        tracer=tracer)
+                cache.put(dart_key, dart)
+            if hk is None:
+                # ---------- Hong Kong: per-chunk Date/Floor sums merged across months (NaN floors kept)
+                with tracer.stage("hk.aggregate") as st:   # includes the streamed CSV reads
+                    hk_agg = stream_floor_daily(cfg.hk_start, cfg.hk_end, src_dir=cfg.hk_data_dir)
+                    st.rows_out = len(hk_agg)
+
+        if hk_agg is not None:
+            hk = _hk_stage(hk_agg, floor_centroids, **stage_args, tracer=tracer)
+            cache.put(hk_key, hk)
+
+    dart_out, dart_clean = dart
+    hk_out, hk_clean = hk
 
     # ---------- Save (all timestamps now in Jan 2015)
-    dart_out.to_csv(OUT_DIR / "dartmouth_placed_raw_jan2015.csv", index=False)
-    dart_clean.to_csv(OUT_DIR / "dartmouth_placed_windowed_dedup_jan2015.csv", index=False)
-    hk_out.to_csv(OUT_DIR / "hk_placed_raw_jan2015.csv", index=False)
-    hk_clean.to_csv(OUT_DIR / "hk_placed_windowed_dedup_jan2015.csv", index=False)
+    with tracer.stage("write", rows_in=len(dart_out) + len(dart_clean) + len(hk_out) + len(hk_clean)) as st:
+        written = [write_output(df, stem, cfg.out_format, cfg.compression, cfg.out_dir) for df, stem in [
+            (dart_out, "dartmouth_placed_raw_jan2015"),
+            (dart_clean, "dartmouth_placed_windowed_dedup_jan2015"),
+            (hk_out, "hk_placed_raw_jan2015"),
+            (hk_clean, "hk_placed_windowed_dedup_jan2015"),
+        ]]
+        st.note = cfg.out_format
 
     # Quick campus totals (both Jan 2015)
-    d_jan15 = dart_clean.copy(); d_jan15["Campus"] = "Main (Dartmouth 2015-01)"
-    h_jan15 = hk_clean.copy();   h_jan15["Campus"] = "Sub (HongKong 2015-01)"
-    both = pd.concat([d_jan15, h_jan15], ignore_index=True)
-
-    monthly_totals = (both.groupby("Campus", as_index=False)
-                           .agg(User_Count=("User-Count","sum"),
-                                WiFi_Conn=("WiFi-Conn","sum"),
-                                Duration_Sec=("Duration-Sec","sum")))
-    monthly_totals.to_csv(OUT_DIR / "jan2015_campus_monthly_totals.csv", index=False)
+    with tracer.stage("totals") as st:
+        d_jan15 = dart_clean.copy(); d_jan15["Campus"] = "Main (Dartmouth 2015-01)"
+        if cfg.hk_totals == "rollup":
+            # Read the shipped grand-total rows directly; the detail rows are never summed
+            h_jan15 = stream_rollup_rows("daily", cfg.hk_start, cfg.hk_end, src_dir=cfg.hk_data_dir)
+        else:
+            h_jan15 = hk_clean.copy()
+        h_jan15["Campus"] = "Sub (HongKong 2015-01)"
+        both = pd.concat([d_jan15, h_jan15], ignore_index=True)
+
+        monthly_totals = (both.groupby("Campus", as_index=False)
+                               .agg(User_Count=("User-Count","sum"),
+                                    WiFi_Conn=("WiFi-Conn","sum"),
+                                    Duration_Sec=("Duration-Sec","sum")))
+        written.append(write_output(monthly_totals, "jan2015_campus_monthly_totals",
+                                    cfg.out_format, cfg.compression, cfg.out_dir))
+        st.rows_in, st.rows_out = len(both), len(monthly_totals)
 
     print("Pipeline complete (dates remapped to Jan 2015).")
-    for p in [
-        OUT_DIR / "dartmouth_placed_raw_jan2015.csv",
-        OUT_DIR / "dartmouth_placed_windowed_dedup_jan2015.csv",
-        OUT_DIR / "hk_placed_raw_jan2015.csv",
-        OUT_DIR / "hk_placed_windowed_dedup_jan2015.csv",
-        OUT_DIR / "jan2015_campus_monthly_totals.csv",
-    ]:
+    for p in written:
         print(" -", p)
+    if tracer.enabled:
+        print("\nStage timings:")
+        print(tracer.format_summary())
+    return written
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+def main(argv: Optional[Sequence[str]] = None) -> List[Path]:
+    """
+    CLI entry point. --config loads a TOML/JSON PipelineConfig; any flag given
+    on the command line overrides the matching config field.
+    """
+    # Flags left off the command line stay out of the namespace (SUPPRESS), so
+    # only the ones given override the config, and an explicit "none" still can
+    parser = argparse.ArgumentParser(description="Wi-Fi placement pipeline (Dartmouth + HK)",
+                                     argument_default=argparse.SUPPRESS)
+    parser.add_argument("--config", type=Path, default=None,
+                        help="TOML/JSON file of PipelineConfig fields (relative paths resolve against it)")
+    parser.add_argument("--dart-aploc", type=Path, help="Dartmouth AP locations CSV")
+    parser.add_argument("--dart-agg", type=Path, help="Dartmouth floor/day aggregate CSV")
+    parser.add_argument("--hk-data-dir", type=Path, help="dir holding the HK <YYYYMM>-wifi-raw.csv files")
+    parser.add_argument("--out-dir", type=Path, help="where outputs are written")
+    parser.add_argument("--cache-dir", type=Path, help=f"stage cache dir (default: <out-dir>/{CACHE_DIR_NAME})")
+    parser.add_argument("--hk-start", help=f"first HK month, e.g. {HK_START}")
+    parser.add_argument("--hk-end", help="last HK month (inclusive)")
+    parser.add_argument("--jobs", type=int, help="worker processes (1 = serial)")
+    parser.add_argument("--hk-totals", choices=("detail", "rollup"),
+                        help="HK campus totals from placed detail rows or the shipped All-Floors/Total rows")
+    parser.add_argument("--validate", action="store_const", const=True,
+                        help="check HK detail rows against the shipped rollup rows")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_const", const=False,
+                        help="recompute every stage")
+    parser.add_argument("--format", dest="out_format", choices=tuple(OUTPUT_SUFFIX),
+                        help=f"output file format (default {OUTPUT_FORMAT})")
+    parser.add_argument("--compression", type=lambda v: None if v.lower() == "none" else v,
+                        help="Parquet/Feather codec, e.g. zstd, snappy, lz4, or none")
+    parser.add_argument("--trace", action="store_true", default=False,
+                        help="print per-stage time/CPU/rows/peak RSS")
+    parser.add_argument("--trace-log", type=Path, default=None,
+                        help="also append per-stage records to this JSON-lines file")
+    args = vars(parser.parse_args(argv))
+
+    trace, trace_log = args.pop("trace"), args.pop("trace_log")
+    cfg = load_config(args.pop("config"), **args)
+    tracer = Tracer(trace_log) if (trace or trace_log) else NULL_TRACER
+    return run_pipeline(cfg, tracer=tracer)
 
 
 if __name__ == "__main__":
-    run_pipeline()
+    main()
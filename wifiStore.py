@@ -0,0 +1,559 @@
+# wifiStore.py
+# Columnar store for the HK dataverse_files corpus.
+# Converts the monthly CSVs (daily / period / hourly) once into Parquet partitions:
+#   <store>/<schema>/ym=<YYYYMM>/data.parquet
+# and loads back only the partitions and columns a job asks for.
+# Re-ingest is incremental: <store>/_ledger.json tracks each CSV's size + sha256,
+# and per-month aggregates under <store>/_derived/ are dropped only for changed months.
+
+import os
+import re
+import json
+import shutil
+import hashlib
+import argparse
+import warnings
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# =============================================================================
+# PATHS
+# =============================================================================
+REPO_DIR      = Path(__file__).resolve().parent
+DATAVERSE_DIR = REPO_DIR / "src" / "backend" / "dataverse_files"   # monthly CSVs + MANIFEST.TXT
+STORE_DIR     = REPO_DIR / "src" / "backend" / "dataverse_store"   # Parquet partitions
+
+LEDGER_NAME   = "_ledger.json"   # inside STORE_DIR
+DERIVED_DIR   = "_derived"       # inside STORE_DIR: per-month aggregates built from partitions
+
+
+# =============================================================================
+# Corpus layout
+# =============================================================================
+# <YYYYMM>-wifi-raw.csv         -> "daily":  Date,Floor,User-Group,User-Count,WiFi-Conn,Duration-Sec,Traffic-*
+# <YYYYMM>-wifi-period-raw.csv  -> "period": Date,Period,User-Group,User-Count,WiFi-Conn
+# <YYYYMM>-wifi-hourly-raw.csv  -> "hourly": Date,Hour,Floor,User-Group,User-Count,WiFi-Conn
+SCHEMA_NAMES = ("daily", "period", "hourly")
+_CSV_NAME = re.compile(r"^(?P<ym>\d{6})-wifi-(?:(?P<kind>period|hourly)-)?raw\.csv$")
+
+
+
+# =============================================================================
+# Schema registry: explicit dtypes for every CSV shape we read
+# =============================================================================
+# Label vocabularies seen across 2014-2022. Lexical order, so grouping on the
+# category codes gives the same row order as grouping on the raw strings.
+# Labels outside these lists are appended as extra categories, never dropped.
+FLOOR_LABELS = ("1", "All-Floors", "G", "LG1", "LG3", "LG4")
+USER_GROUPS  = ("Alumni", "Non-HKUST", "Others(HKUST)", "RPG", "Staff", "TPG", "Total", "UG")
+PERIODS      = ("Afternoon", "All-Periods", "Early-Morning", "Evening", "Late-Afternoon",
+                "Midnight", "Morning")
+
+
+class FloorInfo(NamedTuple):
+    ordinal: float        # building level: G = 0, 1/F = 1, LG1 = -1, ...; NaN for rollups
+    elevation_m: float    # slab height used by the 3D views; NaN for rollups
+    is_aggregate: bool    # rollup row (All-Floors), not a physical floor
+
+
+# HKUST library floors, shared by run_pipeline and src/backend/heatmap.ipynb
+FLOOR_INFO: Dict[str, FloorInfo] = {
+    "LG4":        FloorInfo(-4, -12.0, False),
+    "LG3":        FloorInfo(-3,  -8.0, False),
+    "LG1":        FloorInfo(-1,  -4.0, False),
+    "G":          FloorInfo( 0,   0.0, False),
+    "1":          FloorInfo( 1,   4.0, False),
+    "ALL-FLOORS": FloorInfo(np.nan, np.nan, True),
+}
+
+
+def floor_lookup(floors: pd.Series, attr: str) -> pd.Series:
+    """
+    FloorInfo attribute ("ordinal", "elevation_m", "is_aggregate") per row,
+    aligned to floors.index.
+    Labels are normalized once per category (strip/upper), then broadcast
+    through the category codes; unknown labels give NaN (False for is_aggregate).
+    """
+    cat = floors if isinstance(floors.dtype, pd.CategoricalDtype) else floors.astype(str).astype("category")
+    missing = False if attr == "is_aggregate" else np.nan
+    table = np.array([getattr(FLOOR_INFO.get(str(c).strip().upper()), attr, missing)
+                      for c in cat.cat.categories] + [missing])
+    # code -1 (NaN label) hits the trailing `missing`
+    return pd.Series(table[cat.cat.codes.to_numpy()], index=floors.index, name=attr)
+
+
+@dataclass(frozen=True)
+class CsvSchema:
+    """
+    Columns (in file order) with their storage dtype, for the C parser.
+    dtype "date" -> parsed with date_format; "category" -> categorical over
+    categories[col]. names replaces an unusable header row.
+    """
+    name: str
+    dtypes: Mapping[str, str]
+    categories: Mapping[str, Tuple[str, ...]] = field(default_factory=dict)
+    date_format: str = "%Y-%m-%d"
+    names: Optional[Tuple[str, ...]] = None
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.dtypes)
+
+    def read_csv(self, path: Path, columns: Optional[Sequence[str]] = None,
+                 chunksize: Optional[int] = None):
+        """pd.read_csv with usecols/dtypes from the schema; a chunk iterator if chunksize is set."""
+        cols = self.columns if columns is None else [c for c in self.dtypes if c in columns]
+        missing = set(columns or ()) - set(self.dtypes)
+        if missing:
+            raise KeyError(f"{self.name}: unknown columns {sorted(missing)}")
+        dates = [c for c in cols if self.dtypes[c] == "date"]
+        dtype = {c: self.dtypes[c] for c in cols if self.dtypes[c] != "date"}
+        kw: Dict[str, Any] = {}
+        if self.names is not None:
+            kw = dict(header=None, skiprows=1, names=list(self.names))
+        read = pd.read_csv(path, engine="c", usecols=cols, dtype=dtype, parse_dates=dates,
+                           date_format=self.date_format, chunksize=chunksize, **kw)
+        if chunksize is not None:
+            return (self._fix_categories(chunk) for chunk in read)
+        return self._fix_categories(read)
+
+    def _fix_categories(self, df: pd.DataFrame) -> pd.DataFrame:
+        for c, cats in self.categories.items():
+            if c in df.columns:
+                extra = sorted(set(df[c].cat.categories) - set(cats))
+                df[c] = df[c].cat.set_categories(list(cats) + extra)
+        return df
+
+
+SCHEMA_REV = 2   # bump when SCHEMAS changes; ingest then reconverts every partition
+
+SCHEMAS: Dict[str, CsvSchema] = {
+    "daily": CsvSchema(
+        "daily",
+        {"Date": "date", "Floor": "category", "User-Group": "category",
+         "User-Count": "int32", "WiFi-Conn": "int32", "Duration-Sec": "int32",
+         "Traffic-In-Byte": "int64", "Traffic-Out-Byte": "int64", "Traffic-Both-Byte": "int64"},
+        {"Floor": FLOOR_LABELS, "User-Group": USER_GROUPS}),
+    "period": CsvSchema(
+        "period",
+        {"Date": "date", "Period": "category", "User-Group": "category",
+         "User-Count": "int32", "WiFi-Conn": "int32"},
+        {"Period": PERIODS, "User-Group": USER_GROUPS}),
+    "hourly": CsvSchema(
+        "hourly",
+        {"Date": "date", "Hour": "int8", "Floor": "category", "User-Group": "category",
+         "User-Count": "int32", "WiFi-Conn": "int32"},
+        {"Floor": FLOOR_LABELS, "User-Group": USER_GROUPS}),
+    # Dartmouth APlocations.csv / dartmouth-location-data.csv; its header has a
+    # comma inside "z coordinate (floor, 99 = unknown)", so names are fixed here.
+    "dartmouth_ap": CsvSchema(
+        "dartmouth_ap",
+        {"AP": "str", "x": "float64", "y": "float64", "floor_raw": "float32"},
+        names=("AP", "x", "y", "floor_raw")),
+    # Dartmouth floor/day aggregate (run_pipeline's dart_agg); Floor stays text
+    # because rollup rows (All-Floors) share the column with the floor numbers
+    "dartmouth_agg": CsvSchema(
+        "dartmouth_agg",
+        {"Date": "date", "Floor": "str", "User-Count": "int32", "WiFi-Conn": "int32", "Duration-Sec": "int32"}),
+}
+CATEGORICAL_COLS = ("Floor", "User-Group", "Period")
+
+
+@dataclass(frozen=True)
+class MonthFile:
+    schema: str   # "daily" | "period" | "hourly"
+    ym: str       # "YYYYMM"
+    path: Path
+
+
+def scan_dataverse(src_dir: Path = DATAVERSE_DIR) -> List[MonthFile]:
+    """All monthly CSVs under src_dir, sorted by (schema, month). Other files are ignored."""
+    found = []
+    for p in Path(src_dir).iterdir():
+        m = _CSV_NAME.match(p.name)
+        if m:
+            found.append(MonthFile(m.group("kind") or "daily", m.group("ym"), p))
+    return sorted(found, key=lambda f: (SCHEMA_NAMES.index(f.schema), f.ym))
+
+
+def list_month_files(schema: str, start=None, end=None, src_dir: Path = DATAVERSE_DIR) -> List[MonthFile]:
+    """CSVs of this schema in [start, end], ascending by month."""
+    return [f for f in scan_dataverse(src_dir) if f.schema == schema and _in_range(f.ym, start, end)]
+
+
+def list_months(schema: str, start=None, end=None, src_dir: Path = DATAVERSE_DIR) -> List[str]:
+    """Months ("YYYYMM") with a CSV of this schema in [start, end], ascending."""
+    return [f.ym for f in list_month_files(schema, start, end, src_dir)]
+
+
+def _month_key(month) -> str:
+    """'2021-01', '202101', Timestamp/date -> '202101'."""
+    if isinstance(month, str) and re.fullmatch(r"\d{6}", month):
+        return month
+    return pd.Timestamp(month).strftime("%Y%m")
+
+
+def _in_range(ym: str, start=None, end=None) -> bool:
+    return (start is None or ym >= _month_key(start)) and (end is None or ym <= _month_key(end))
+
+
+def read_month_csv(f: MonthFile, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Parse one monthly CSV with its registered schema (typed, categorical labels)."""
+    return SCHEMAS[f.schema].read_csv(f.path, columns=columns)
+
+
+# =============================================================================
+# Ingest: CSV -> partitioned Parquet
+# =============================================================================
+def partition_path(store_dir: Path, schema: str, ym: str) -> Path:
+    return Path(store_dir) / schema / f"ym={ym}" / "data.parquet"
+
+
+# =============================================================================
+# Ledger: size + content hash per CSV, so unchanged months are skipped
+# =============================================================================
+def _sha256(path: Path, block: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def read_manifest(src_dir: Path = DATAVERSE_DIR) -> Dict[str, int]:
+    """MANIFEST.TXT lines like '201501-wifi-raw.csv (text/csv) 105704 bytes.' -> {name: size}."""
+    path = Path(src_dir) / "MANIFEST.TXT"
+    if not path.exists():
+        return {}
+    sizes = {}
+    for line in path.read_text().splitlines():
+        m = re.match(r"^(\S+)\s+\(.*?\)\s+(\d+)\s+bytes", line.strip())
+        if m:
+            sizes[m.group(1)] = int(m.group(2))
+    return sizes
+
+
+def load_ledger(store_dir: Path = STORE_DIR) -> Dict[str, Dict[str, Any]]:
+    path = Path(store_dir) / LEDGER_NAME
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text()).get("files", {})
+
+
+def _save_ledger(store_dir: Path, files: Dict[str, Dict[str, Any]]) -> None:
+    path = Path(store_dir) / LEDGER_NAME
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"version": 1, "files": files}, indent=1, sort_keys=True))
+    os.replace(tmp, path)
+
+
+def derived_path(store_dir: Path, name: str, schema: str, ym: str) -> Path:
+    """Directory for a per-month aggregate built from one partition (dropped when that month changes)."""
+    return Path(store_dir) / DERIVED_DIR / name / schema / f"ym={ym}"
+
+
+def invalidate_derived(store_dir: Path, schema: str, ym: str) -> List[Path]:
+    """Delete every derived output for one (schema, month). Returns the removed directories."""
+    removed = []
+    for d in (Path(store_dir) / DERIVED_DIR).glob(f"*/{schema}/ym={ym}"):
+        shutil.rmtree(d)
+        removed.append(d)
+    return removed
+
+
+@dataclass
+class IngestReport:
+    written: List[Path] = field(default_factory=list)    # partitions (re)converted
+    skipped: List[Path] = field(default_factory=list)    # unchanged CSVs
+    removed: List[Path] = field(default_factory=list)    # partitions whose CSV disappeared
+    invalidated: List[Path] = field(default_factory=list)  # derived dirs dropped
+
+
+def ingest(src_dir: Path = DATAVERSE_DIR,
+           store_dir: Path = STORE_DIR,
+           compression: str = "zstd",
+           force: bool = False) -> IngestReport:
+    """
+    Convert monthly CSVs in src_dir into Parquet partitions, incrementally.
+    A CSV is re-parsed only if it is new, or its size/content hash differs from
+    the ledger entry (mtime-only changes are re-hashed, not re-parsed).
+    Derived aggregates are invalidated only for the months that changed.
+    force=True reconverts every CSV still present; partitions of CSVs removed
+    since the last ingest are dropped either way.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    # Loaded even with force: the removal pass below works from the old entries
+    ledger = load_ledger(store_dir)
+    manifest = read_manifest(src_dir)
+    report = IngestReport()
+    seen = set()
+
+    for f in scan_dataverse(src_dir):
+        name = f.path.name
+        seen.add(name)
+        st = f.path.stat()
+        if name in manifest and manifest[name] != st.st_size:
+            warnings.warn(f"{name}: {st.st_size} bytes on disk, MANIFEST.TXT says {manifest[name]}")
+
+        out = partition_path(store_dir, f.schema, f.ym)
+        entry = ledger.get(name)
+        if (not force and entry and entry["size"] == st.st_size and out.exists()
+                and entry.get("schema_rev") == SCHEMA_REV):
+            if entry["mtime_ns"] == st.st_mtime_ns:
+                report.skipped.append(f.path)
+                continue
+            digest = _sha256(f.path)
+            if digest == entry["sha256"]:
+                entry["mtime_ns"] = st.st_mtime_ns
+                report.skipped.append(f.path)
+                continue
+        else:
+            digest = _sha256(f.path)
+
+        out.parent.mkdir(parents=True, exist_ok=True)
+        read_month_csv(f).to_parquet(out, index=False, compression=compression)
+        report.written.append(out)
+        report.invalidated += invalidate_derived(store_dir, f.schema, f.ym)
+        ledger[name] = dict(schema=f.schema, ym=f.ym, size=st.st_size,
+                            mtime_ns=st.st_mtime_ns, sha256=digest, schema_rev=SCHEMA_REV)
+
+    # CSVs that disappeared since the last ingest
+    for name in sorted(set(ledger) - seen):
+        entry = ledger.pop(name)
+        part = partition_path(store_dir, entry["schema"], entry["ym"])
+        if part.exists():
+            shutil.rmtree(part.parent)
+            report.removed.append(part)
+        report.invalidated += invalidate_derived(store_dir, entry["schema"], entry["ym"])
+
+    _save_ledger(store_dir, ledger)
+    return report
+
+
+# =============================================================================
+# Loader: only the partitions/columns a job needs
+# =============================================================================
+def list_partitions(schema: str, store_dir: Path = STORE_DIR, start=None, end=None) -> List[str]:
+    """Months ("YYYYMM") present in the store for a schema, optionally within [start, end]."""
+    base = Path(store_dir) / schema
+    if not base.is_dir():
+        return []
+    return sorted(p.name[3:] for p in base.glob("ym=*")
+                  if (p / "data.parquet").exists() and _in_range(p.name[3:], start, end))
+
+
+def load_store(schema: str,
+               start=None,
+               end=None,
+               columns: Optional[Sequence[str]] = None,
+               months: Optional[Iterable] = None,
+               store_dir: Path = STORE_DIR) -> pd.DataFrame:
+    """
+    Read one schema from the store. Select months either with an inclusive
+    start/end range (e.g. "2015-01", "2015-12") or an explicit months list;
+    columns limits which Parquet columns are read at all.
+    """
+    if schema not in SCHEMA_NAMES:
+        raise ValueError(f"unknown schema {schema!r}; expected one of {SCHEMA_NAMES}")
+    wanted = None if months is None else {_month_key(m) for m in months}
+    yms = [ym for ym in list_partitions(schema, store_dir)
+           if _in_range(ym, start, end) and (wanted is None or ym in wanted)]
+    cols = None if columns is None else list(columns)
+    parts = [pd.read_parquet(partition_path(store_dir, schema, ym), columns=cols) for ym in yms]
+    if not parts:
+        raise FileNotFoundError(f"no {schema} partitions in {store_dir} for the requested months "
+                                f"(run `python wifiStore.py ingest` first?)")
+    out = pd.concat(parts, ignore_index=True)
+    # Per-month category sets differ slightly; re-unify after concat
+    for c in CATEGORICAL_COLS:
+        if c in out.columns and out[c].dtype != "category":
+            out[c] = out[c].astype("category")
+    return out
+
+
+# =============================================================================
+# Streaming CSV reader: any month range, bounded memory
+# =============================================================================
+FLOOR_SUM_COLS = ("User-Count", "WiFi-Conn", "Duration-Sec")
+# Stored as int32 (SCHEMAS), summed as int64: one month of Duration-Sec already passes 4e8
+FLOOR_SUM_DTYPES = {c: "int64" for c in FLOOR_SUM_COLS}
+
+
+def iter_month_chunks(schema: str = "daily",
+                      start=None,
+                      end=None,
+                      columns: Optional[Sequence[str]] = None,
+                      chunksize: int = 100_000,
+                      src_dir: Path = DATAVERSE_DIR) -> Iterator[pd.DataFrame]:
+    """
+    Yield chunks of at most chunksize rows from every monthly CSV of one schema
+    in [start, end] (inclusive months), in month order. Every chunk is typed by
+    the schema registry and shares the same label categories.
+    """
+    for f in scan_dataverse(src_dir):
+        if f.schema != schema or not _in_range(f.ym, start, end):
+            continue
+        yield from SCHEMAS[schema].read_csv(f.path, columns=columns, chunksize=chunksize)
+
+
+def stream_floor_daily(start=None,
+                       end=None,
+                       chunksize: int = 100_000,
+                       src_dir: Path = DATAVERSE_DIR) -> pd.DataFrame:
+    """
+    groupby(["Date","Floor"]).sum() of User-Count/WiFi-Conn/Duration-Sec over the
+    daily files in [start, end], reduced chunk by chunk. Only the running partial
+    aggregate (days x floors) stays in memory, however many months are read.
+    The sums are int64 whatever the range. Only the per-group rows are summed:
+    the shipped User-Group "Total" rows repeat them and would double every count.
+    """
+    keys = ["Date", "Floor"]
+    total = ROLLUP_LABELS["daily"]["User-Group"]
+    acc = None
+    for chunk in iter_month_chunks("daily", start, end, columns=keys + ["User-Group"] + list(FLOOR_SUM_COLS),
+                                   chunksize=chunksize, src_dir=src_dir):
+        part = (chunk.loc[chunk["User-Group"] != total].astype(FLOOR_SUM_DTYPES)
+                     .groupby(keys, dropna=False, observed=True)[list(FLOOR_SUM_COLS)].sum()
+                     .reset_index())
+        acc = part if acc is None else merge_floor_daily([acc, part])
+    if acc is None:
+        raise FileNotFoundError(f"no daily HK files in {src_dir} between {start} and {end}")
+    return acc
+
+
+def merge_floor_daily(parts: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """Combine partial stream_floor_daily results (e.g. one per month/worker) into one."""
+    if not parts:
+        raise ValueError("no partial aggregates to merge")
+    return (pd.concat(parts, ignore_index=True)
+              .astype(FLOOR_SUM_DTYPES)
+              .groupby(["Date", "Floor"], dropna=False, observed=True)[list(FLOOR_SUM_COLS)].sum()
+              .reset_index())
+
+
+# =============================================================================
+# Shipped rollup rows: consistency check + totals shortcut
+# =============================================================================
+# Each file carries, per dimension, rollup rows whose label stands for "all of them".
+ROLLUP_LABELS = {
+    "daily":  {"Floor": "All-Floors", "User-Group": "Total"},
+    "hourly": {"Floor": "All-Floors", "User-Group": "Total"},
+    "period": {"Period": "All-Periods", "User-Group": "Total"},
+}
+# Measures that are distinct counts across a dimension: a user seen on two floors
+# (or a connection spanning two periods) is counted once in the rollup row, so the
+# detail sum may exceed it but never fall short. Everything else must add up exactly.
+OVERLAP_MEASURES = {"Floor": ("User-Count",), "Period": ("User-Count", "WiFi-Conn")}
+
+
+def _key_columns(schema: str) -> List[str]:
+    return [c for c, t in SCHEMAS[schema].dtypes.items() if t in ("date", "category") or c == "Hour"]
+
+
+def rollup_diffs(df: pd.DataFrame, schema: str) -> Dict[str, pd.DataFrame]:
+    """
+    Per rolled-up dimension: sum(detail rows) - rollup row for every cell of the
+    other keys, as int64. One signed groupby per dimension (rollup rows enter with
+    weight -1), so partial results from separate chunks simply add up.
+    """
+    keys = _key_columns(schema)
+    measures = [c for c in df.columns if c not in keys]
+    out = {}
+    for dim, label in ROLLUP_LABELS[schema].items():
+        sign = np.where(df[dim] == label, -1, 1)
+        signed = df[measures].astype("int64").mul(sign, axis=0)
+        out[dim] = signed.groupby([df[k] for k in keys if k != dim], observed=True).sum()
+    return out
+
+
+def check_rollups(schema: str = "daily",
+                  start=None,
+                  end=None,
+                  chunksize: int = 100_000,
+                  src_dir: Path = DATAVERSE_DIR) -> pd.DataFrame:
+    """
+    Verify detail rows against the shipped rollup rows over [start, end].
+    One row per (dimension, measure): cells checked, mismatching cells, the
+    largest |diff| and the first bad cell. Overlapping measures only fail when
+    the detail sum is below the rollup.
+    """
+    acc: Dict[str, pd.DataFrame] = {}
+    for chunk in iter_month_chunks(schema, start, end, chunksize=chunksize, src_dir=src_dir):
+        for dim, part in rollup_diffs(chunk, schema).items():
+            acc[dim] = part if dim not in acc else acc[dim].add(part, fill_value=0).astype("int64")
+    if not acc:
+        raise FileNotFoundError(f"no {schema} HK files in {src_dir} between {start} and {end}")
+
+    rows = []
+    for dim, diffs in acc.items():
+        for m in diffs.columns:
+            d = diffs[m]
+            bad = d < 0 if m in OVERLAP_MEASURES.get(dim, ()) else d != 0
+            rows.append(dict(dim=dim, measure=m, cells=len(d), mismatches=int(bad.sum()),
+                             max_abs_diff=int(d[bad].abs().max()) if bad.any() else 0,
+                             first_bad=d.index[bad.to_numpy()][0] if bad.any() else None))
+    return pd.DataFrame(rows)
+
+
+def stream_rollup_rows(schema: str = "daily",
+                       start=None,
+                       end=None,
+                       chunksize: int = 100_000,
+                       src_dir: Path = DATAVERSE_DIR) -> pd.DataFrame:
+    """
+    Only the grand-total rows (every dimension at its rollup label, e.g.
+    All-Floors x Total) over [start, end]. Campus totals read these directly
+    instead of aggregating the detail rows, so the counts come back as int64.
+    """
+    labels = ROLLUP_LABELS[schema]
+    parts = []
+    for chunk in iter_month_chunks(schema, start, end, chunksize=chunksize, src_dir=src_dir):
+        keep = np.logical_and.reduce([(chunk[dim] == lab).to_numpy() for dim, lab in labels.items()])
+        parts.append(chunk.loc[keep])
+    if not parts:
+        raise FileNotFoundError(f"no {schema} HK files in {src_dir} between {start} and {end}")
+    out = pd.concat(parts, ignore_index=True)
+    keys = _key_columns(schema)
+    return out.astype({c: "int64" for c in out.columns if c not in keys})
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="HK dataverse_files columnar store")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ing = sub.add_parser("ingest", help="convert monthly CSVs into Parquet partitions")
+    ing.add_argument("--src", type=Path, default=DATAVERSE_DIR)
+    ing.add_argument("--store", type=Path, default=STORE_DIR)
+    ing.add_argument("--compression", default="zstd")
+    ing.add_argument("--force", action="store_true", help="ignore the ledger and reconvert everything")
+    chk = sub.add_parser("check", help="verify detail rows against the shipped rollup rows")
+    chk.add_argument("--src", type=Path, default=DATAVERSE_DIR)
+    chk.add_argument("--schema", choices=SCHEMA_NAMES, default="daily")
+    chk.add_argument("--start", default=None, help="first month, e.g. 2015-01")
+    chk.add_argument("--end", default=None, help="last month (inclusive)")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "ingest":
+        rep = ingest(args.src, args.store, compression=args.compression, force=args.force)
+        print(f"Ingest complete -> {args.store}")
+        print(f" - converted: {len(rep.written)}  unchanged: {len(rep.skipped)}  "
+              f"removed: {len(rep.removed)}  derived invalidated: {len(rep.invalidated)}")
+        for p in rep.written:
+            print(" +", p)
+    elif args.cmd == "check":
+        report = check_rollups(args.schema, args.start, args.end, src_dir=args.src)
+        print(report.to_string(index=False))
+        if report["mismatches"].any():
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# wifiTensor.py
+# Dense hourly occupancy tensors over the HK columnar store (see wifiStore.py).
+# Each month of the hourly schema becomes one int32 .npy file per measure:
+#   <store>/_derived/tensor/hourly/ym=<YYYYMM>/<measure>.npy
+# shaped (day, hour, floor, user_group) with the axes labelled by
+# wifiStore.FLOOR_LABELS / USER_GROUPS. Files are opened memory-mapped, so a
+# slice (one floor, one hour, ...) is a view into the page cache, not a parse.
+# Cells absent from the CSV are 0. Re-ingesting a month drops its tensors.
+
+import argparse
+from pathlib import Path
+from typing import Optional, Iterator, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from wifiStore import FLOOR_LABELS, STORE_DIR, USER_GROUPS, derived_path, list_partitions, load_store
+
+
+# =============================================================================
+# Tensor layout
+# =============================================================================
+TENSOR_NAME     = "tensor"                       # derived_path(store, TENSOR_NAME, "hourly", ym)
+TENSOR_MEASURES = ("User-Count", "WiFi-Conn")    # everything the hourly files carry
+AXES            = ("day", "hour", "floor", "user_group")
+HOURS           = 24
+
+
+def tensor_path(store_dir: Path, measure: str, ym: str) -> Path:
+    if measure not in TENSOR_MEASURES:
+        raise ValueError(f"unknown measure {measure!r}; expected one of {TENSOR_MEASURES}")
+    return derived_path(store_dir, TENSOR_NAME, "hourly", ym) / f"{measure}.npy"
+
+
+def month_days(ym: str) -> pd.DatetimeIndex:
+    """Dates along the day axis of one month's tensor."""
+    first = pd.Timestamp(f"{ym[:4]}-{ym[4:]}-01")
+    return pd.date_range(first, periods=first.days_in_month, freq="D")
+
+
+def _axis_codes(values: pd.Series, labels: Sequence[str], col: str) -> np.ndarray:
+    codes = pd.Categorical(values, categories=list(labels)).codes
+    if (codes < 0).any():
+        unknown = sorted(set(values.astype(str)[codes < 0]))
+        raise ValueError(f"{col} labels {unknown} are not in the tensor axis {tuple(labels)}")
+    return codes
+
+
+# =============================================================================
+# Build: one hourly partition -> one .npy per measure
+# =============================================================================
+def month_tensors(df: pd.DataFrame, ym: str) -> dict:
+    """Scatter one month of hourly rows into dense (day, hour, floor, user_group) arrays."""
+    shape = (len(month_days(ym)), HOURS, len(FLOOR_LABELS), len(USER_GROUPS))
+    idx = (df["Date"].dt.day.to_numpy() - 1,
+           df["Hour"].to_numpy(),
+           _axis_codes(df["Floor"], FLOOR_LABELS, "Floor"),
+           _axis_codes(df["User-Group"], USER_GROUPS, "User-Group"))
+    out = {}
+    for m in TENSOR_MEASURES:
+        arr = np.zeros(shape, dtype=np.int32)
+        arr[idx] = df[m].to_numpy()
+        out[m] = arr
+    return out
+
+
+def build_tensors(start=None,
+                  end=None,
+                  store_dir: Path = STORE_DIR,
+                  force: bool = False) -> List[Path]:
+    """
+    Write tensors for every hourly store month in [start, end] that lacks them
+    (or all of them with force=True). Returns the files written.
+    """
+    written = []
+    for ym in list_partitions("hourly", store_dir, start, end):
+        paths = {m: tensor_path(store_dir, m, ym) for m in TENSOR_MEASURES}
+        if not force and all(p.exists() for p in paths.values()):
+            continue
+        df = load_store("hourly", months=[ym], store_dir=store_dir,
+                        columns=["Date", "Hour", "Floor", "User-Group"] + list(TENSOR_MEASURES))
+        for m, arr in month_tensors(df, ym).items():
+            p = paths[m]
+            p.parent.mkdir(parents=True, exist_ok=True)
+            tmp = p.with_name(p.stem + ".tmp.npy")
+            np.save(tmp, arr)
+            tmp.replace(p)
+            written.append(p)
+    return written
+
+
+# =============================================================================
+# Access: memory-mapped months and label-indexed slices
+# =============================================================================
+Index = Union[None, int, str, slice]
+
+
+def open_month(ym: str, measure: str = "User-Count", store_dir: Path = STORE_DIR) -> np.memmap:
+    """Read-only memmap of one month's tensor; nothing is read until it is indexed."""
+    p = tensor_path(store_dir, measure, ym)
+    if not p.exists():
+        raise FileNotFoundError(f"{p} missing (run `python wifiTensor.py build` first?)")
+    return np.load(p, mmap_mode="r")
+
+
+def _label_index(key: Index, labels: Sequence[str]):
+    if key is None:
+        return slice(None)
+    if isinstance(key, str):
+        return list(labels).index(key)
+    return key
+
+
+def select(arr: np.ndarray, hour: Index = None, floor: Index = None, group: Index = None) -> np.ndarray:
+    """
+    Basic-indexing view of a (day, hour, floor, user_group) tensor. Floor and
+    group accept labels ("G", "UG") or positions; None keeps the whole axis.
+    Scalar keys drop their axis, so the day axis always comes first.
+    """
+    return arr[:, slice(None) if hour is None else hour,
+                  _label_index(floor, FLOOR_LABELS),
+                  _label_index(group, USER_GROUPS)]
+
+
+def iter_months(measure: str = "User-Count",
+                start=None,
+                end=None,
+                store_dir: Path = STORE_DIR) -> Iterator[Tuple[str, np.memmap]]:
+    """(ym, memmap) for every hourly month in [start, end] that has a tensor."""
+    for ym in list_partitions("hourly", store_dir, start, end):
+        yield ym, open_month(ym, measure, store_dir)
+
+
+def hourly_series(measure: str = "User-Count",
+                  floor: Index = "All-Floors",
+                  group: Index = "Total",
+                  hour: Optional[int] = None,
+                  start=None,
+                  end=None,
+                  store_dir: Path = STORE_DIR) -> pd.Series:
+    """
+    Time series for one floor x user group over [start, end]: every hour, or one
+    value per day when hour is given (e.g. 14:00 across a year). Per-month
+    slices are views; only the selected values are copied into the result.
+    """
+    values, index = [], []
+    for ym, arr in iter_months(measure, start, end, store_dir):
+        view = select(arr, hour=hour, floor=floor, group=group)
+        if view.ndim != (2 if hour is None else 1):
+            raise ValueError("hourly_series needs a single floor and a single group")
+        days = month_days(ym)
+        if hour is None:
+            index.append((days.values[:, None] + np.arange(HOURS) * np.timedelta64(1, "h")).ravel())
+        else:
+            index.append(days.values + np.timedelta64(hour, "h"))
+        values.append(view.reshape(-1))
+    if not values:
+        raise FileNotFoundError(f"no hourly tensors in {store_dir} for the requested months")
+    return pd.Series(np.concatenate(values), index=pd.DatetimeIndex(np.concatenate(index)), name=measure)
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Memory-mapped hourly tensors over the HK columnar store")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="write .npy tensors for hourly store months that lack them")
+    b.add_argument("--store", type=Path, default=STORE_DIR)
+    b.add_argument("--start", default=None, help="first month, e.g. 2020-04")
+    b.add_argument("--end", default=None, help="last month (inclusive)")
+    b.add_argument("--force", action="store_true", help="rebuild existing tensors")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        written = build_tensors(args.start, args.end, store_dir=args.store, force=args.force)
+        print(f"Tensor build complete -> {args.store}")
+        print(f" - files written: {len(written)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# wifiTrace.py
+# Per-stage instrumentation for the pipeline: wall time, CPU time, rows in/out
+# and peak RSS for each `with tracer.stage(...)` block (or @tracer.wrap function).
+# Finished stages are kept in tracer.records, summarized as a DataFrame, and
+# optionally appended to a JSON-lines log. NULL_TRACER does no measuring at all,
+# so instrumented code costs one no-op context manager per stage when disabled.
+
+import os
+import sys
+import json
+import time
+import uuid
+import functools
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional, Callable, Iterator, List
+
+import pandas as pd
+
+
+# =============================================================================
+# Peak RSS (Linux: resettable high-water mark; elsewhere: process maximum)
+# =============================================================================
+def _read_status_kb(field: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's RSS high-water mark to the current RSS. False if unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def current_rss() -> Optional[int]:
+    kb = _read_status_kb("VmRSS")
+    return None if kb is None else kb * 1024
+
+
+def peak_rss() -> int:
+    kb = _read_status_kb("VmHWM")
+    if kb is not None:
+        return kb * 1024
+    import resource
+    scale = 1 if sys.platform == "darwin" else 1024   # bytes on macOS, KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+# =============================================================================
+# Stage records
+# =============================================================================
+@dataclass
+class StageRecord:
+    stage: str
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None    # set inside the block: `st.rows_out = len(out)`
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_bytes: Optional[int] = None
+    depth: int = 0                    # nesting level (0 = top-level stage)
+    note: Optional[str] = None        # e.g. "cache hit"
+
+
+class Tracer:
+    """
+    Collects StageRecords. Nested stages are allowed; a parent's peak RSS
+    includes its children's. log_path appends one JSON object per finished
+    stage (tagged with run_id), so several runs can share one log.
+    """
+
+    def __init__(self, log_path: Optional[Path] = None, run_id: Optional[str] = None):
+        self.enabled = True
+        self.records: List[StageRecord] = []
+        self.log_path = None if log_path is None else Path(log_path)
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self._stack: List[List[int]] = []    # running peak per open stage
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None) -> Iterator[StageRecord]:
+        rec = StageRecord(name, rows_in=rows_in, depth=len(self._stack))
+        self.records.append(rec)   # start order; filled in on exit
+        if self._stack:   # fold the parent's peak so far before resetting the mark
+            self._stack[-1][0] = max(self._stack[-1][0], peak_rss())
+        reset_peak_rss()
+        self._stack.append([0])
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield rec
+        finally:
+            rec.wall_s = time.perf_counter() - wall0
+            rec.cpu_s = time.process_time() - cpu0
+            rec.peak_rss_bytes = max(self._stack.pop()[0], peak_rss())
+            if self._stack:
+                self._stack[-1][0] = max(self._stack[-1][0], rec.peak_rss_bytes)
+            self._log(rec)
+
+    def wrap(self, name: Optional[str] = None) -> Callable:
+        """Decorator form of stage(); rows_out is len() of the result when it has one."""
+        def deco(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                with self.stage(name or fn.__name__) as st:
+                    out = fn(*args, **kwargs)
+                    st.rows_out = len(out) if hasattr(out, "__len__") else None
+                return out
+            return inner
+        return deco
+
+    def _log(self, rec: StageRecord) -> None:
+        if self.log_path is None:
+            return
+        line = dict(run_id=self.run_id, ts=time.time(), pid=os.getpid(), **asdict(rec))
+        with open(self.log_path, "a") as fh:
+            fh.write(json.dumps(line) + "\n")
+
+    def summary(self) -> pd.DataFrame:
+        """One row per stage, in start order."""
+        df = pd.DataFrame([asdict(r) for r in self.records],
+                          columns=list(StageRecord.__dataclass_fields__))
+        return df.astype({"rows_in": "Int64", "rows_out": "Int64", "peak_rss_bytes": "Int64"})
+
+    def format_summary(self) -> str:
+        df = self.summary()
+        if df.empty:
+            return "(no stages recorded)"
+        df["stage"] = ["  " * d + s for d, s in zip(df["depth"], df["stage"])]
+        df["peak_rss_mb"] = df["peak_rss_bytes"].astype(float) / 2**20
+        for c in ("rows_in", "rows_out"):
+            df[c] = df[c].astype(object).where(df[c].notna(), "")
+        return df[["stage", "rows_in", "rows_out", "wall_s", "cpu_s", "peak_rss_mb", "note"]] \
+            .to_string(index=False, na_rep="", float_format=lambda v: f"{v:.3f}")
+
+
+class _NullTracer(Tracer):
+    """Disabled tracer: stage() hands out one shared scratch record and measures nothing."""
+    enabled = False
+    records: List[StageRecord] = []
+    log_path = None
+    _null_stage = nullcontext(StageRecord(""))
+
+    def __init__(self):
+        pass
+
+    def stage(self, name: str, rows_in: Optional[int] = None):
+        return self._null_stage
+
+    def wrap(self, name: Optional[str] = None) -> Callable:
+        return lambda fn: fn
+
+    def summary(self) -> pd.DataFrame:
+        return pd.DataFrame(columns=list(StageRecord.__dataclass_fields__))
+
+    def format_summary(self) -> str:
+        return "(tracing disabled)"
+
+
+NULL_TRACER = _NullTracer()